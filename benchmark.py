@@ -0,0 +1,229 @@
+"""Benchmark of the classification pipeline on synthetic polygons and point sets of configurable sizes.
+
+Every configuration (polygon kind, number of vertices, point distribution, number of points) is written to csv
+files, run through the pipeline of main_from_file.main (read, PointSet.classify(), write), and reported as one JSON
+line with the time of each stage as recorded by ClassificationStats (read, MBR filter, grid if enabled, boundary
+and contains or the wedge test of convex polygons, write), the points per second and the peak memory.
+With --spatial-sort, the classification is also timed with the points in the order of a space-filling curve, and
+the speedup against the unsorted order is reported.
+
+Example: python benchmark.py --points 1000 100000 --vertices 100 10000 --output benchmark.jsonl
+"""
+# Import argparse for the command line options
+import argparse
+# Import json for the machine-readable output
+import json
+# Import os and tempfile for the synthetic input files
+import os
+import tempfile
+# Import time and tracemalloc for timings and peak memory
+import time
+import tracemalloc
+# Import numpy for generating the synthetic data
+import numpy as np
+# Import the pipeline stages from main_from_file
+from main_from_file import ClassificationStats, PointSet, read_polygon_from_file, spatial_order, CATEGORY_NAMES, \
+    OUTSIDE, BOUNDARY, INSIDE, SPATIAL_CURVES
+
+POLYGON_KINDS = ("convex", "star", "spiral", "coastline")
+DISTRIBUTIONS = ("uniform", "clustered", "near_boundary")
+
+
+def make_polygon(kind, n_vertices, rng):
+    """The make_polygon() function returns the x- and y-coordinates of a synthetic polygon with about n_vertices
+    vertices, in clockwise order:
+    - convex: a regular polygon;
+    - star: vertices alternating between an outer and an inner radius;
+    - spiral: a band winding three times around the centre, out along one side and back along the other;
+    - coastline: a circle with smooth random noise on the radius, like a many-vertex coastline.
+    """
+    if kind == "spiral":
+        half = max(n_vertices // 2, 3)
+        theta = np.linspace(0, 6 * np.pi, half)
+        outer = 0.1 + theta / (6 * np.pi)
+        inner = outer - 0.08
+        # Out along the outer side of the band, and back along the inner side; this runs counter-clockwise
+        radius = np.concatenate((outer, inner[::-1]))
+        theta = np.concatenate((theta, theta[::-1]))
+    else:
+        theta = np.linspace(0, 2 * np.pi, max(n_vertices, 3), endpoint=False)
+        if kind == "convex":
+            radius = np.ones(len(theta))
+        elif kind == "star":
+            radius = np.where(np.arange(len(theta)) % 2 == 0, 1.0, 0.5)
+        elif kind == "coastline":
+            radius = np.ones(len(theta))
+            for frequency in range(1, 40):
+                radius += rng.normal(0, 0.3 / frequency) * np.sin(frequency * theta + rng.uniform(0, 2 * np.pi))
+            radius = np.clip(radius, 0.2, None)
+        else:
+            raise ValueError("Unknown polygon kind: " + str(kind))
+    # The angles above run counter-clockwise, so the vertices are reversed to make the polygon clockwise
+    return (radius * np.cos(theta))[::-1], (radius * np.sin(theta))[::-1]
+
+
+def make_points(distribution, n_points, polygon_xs, polygon_ys, rng):
+    """The make_points() function returns the x- and y-coordinates of n_points synthetic points around a polygon:
+    - uniform: uniformly spread over the MBR of the polygon, widened by 10%;
+    - clustered: gaussian clusters around 20 random centres in the MBR;
+    - near_boundary: points on random edges, moved off the edge by a tiny gaussian offset (a tenth of the points
+      stay exactly on the edge).
+    """
+    min_x, max_x, min_y, max_y = polygon_xs.min(), polygon_xs.max(), polygon_ys.min(), polygon_ys.max()
+    width, height = max_x - min_x, max_y - min_y
+    if distribution == "uniform":
+        xs = rng.uniform(min_x - 0.1 * width, max_x + 0.1 * width, n_points)
+        ys = rng.uniform(min_y - 0.1 * height, max_y + 0.1 * height, n_points)
+    elif distribution == "clustered":
+        centres = rng.integers(0, 20, n_points)
+        centres_x = rng.uniform(min_x, max_x, 20)
+        centres_y = rng.uniform(min_y, max_y, 20)
+        xs = centres_x[centres] + rng.normal(0, 0.05 * width, n_points)
+        ys = centres_y[centres] + rng.normal(0, 0.05 * height, n_points)
+    elif distribution == "near_boundary":
+        edges = rng.integers(0, len(polygon_xs), n_points)
+        t = rng.uniform(0, 1, n_points)
+        next_edges = (edges + 1) % len(polygon_xs)
+        xs = polygon_xs[edges] + t * (polygon_xs[next_edges] - polygon_xs[edges])
+        ys = polygon_ys[edges] + t * (polygon_ys[next_edges] - polygon_ys[edges])
+        offset = np.where(rng.uniform(0, 1, n_points) < 0.1, 0.0, 1e-4 * max(width, height))
+        xs = xs + rng.normal(0, 1, n_points) * offset
+        ys = ys + rng.normal(0, 1, n_points) * offset
+    else:
+        raise ValueError("Unknown point distribution: " + str(distribution))
+    return xs, ys
+
+
+def write_points_csv(file_path, xs, ys):
+    """The write_points_csv() function writes points to an id,x,y csv file, with ids 0, 1, 2, ..."""
+    with open(file_path, "w") as f:
+        f.write("id,x,y")
+        f.write("".join("\n" + str(i) + "," + repr(x) + "," + repr(y)
+                        for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))))
+
+
+def run_pipeline(polygon_file, input_file, output_file, slab_index=False, grid_resolution=None, workers=1):
+    """The run_pipeline() function runs the pipeline of main_from_file.main on the given files (read the polygon
+    and the points, PointSet.classify(), write the results), and returns the time in seconds of every stage as
+    recorded by a ClassificationStats, the wall time of the whole run, and the number of points in every category.
+    With several workers, the times of the classification stages are summed over the worker processes.
+    """
+    stats = ClassificationStats()
+    start = time.perf_counter()
+    with stats.stage("read_polygon"):
+        polygon = read_polygon_from_file(polygon_file)
+        if slab_index is True:
+            polygon.build_slab_index()
+        if grid_resolution is not None:
+            polygon.build_grid(grid_resolution)
+    with stats.stage("read_points"):
+        points = PointSet.from_file(input_file)
+    categories = points.classify(polygon, workers, stats=stats)
+    with stats.stage("write"):
+        points.write(output_file)
+    wall_seconds = time.perf_counter() - start
+
+    counts = {CATEGORY_NAMES[code]: int(np.count_nonzero(categories == code)) for code in (OUTSIDE, BOUNDARY, INSIDE)}
+    return dict(stats.seconds), wall_seconds, counts
+
+
+def compare_spatial_sort(polygon_file, input_file, curve, slab_index=False, grid_resolution=None, workers=1,
+                         repeats=3):
+    """The compare_spatial_sort() function times PointSet.classify() on the given files with the points in their
+    original order and sorted along a space-filling curve, and returns the best time in seconds of each (the sorted
+    time includes the sorting), the time of the sorting alone, and the speedup.
+    """
+    polygon = read_polygon_from_file(polygon_file)
+    if slab_index is True:
+        polygon.build_slab_index()
+    if grid_resolution is not None:
+        polygon.build_grid(grid_resolution)
+    points = PointSet.from_file(input_file)
+    seconds = {}
+    for name, spatial_sort in (("unsorted", None), ("sorted", curve)):
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            points.classify(polygon, workers, spatial_sort=spatial_sort)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        seconds[name] = best
+    start = time.perf_counter()
+    spatial_order(points.xs, points.ys, curve)
+    seconds["sort"] = time.perf_counter() - start
+    return {"curve": curve, "seconds": seconds,
+            "speedup": seconds["unsorted"] / seconds["sorted"] if seconds["sorted"] > 0 else None}
+
+
+def benchmark(polygon_kinds, vertex_counts, distributions, point_counts, seed=0, slab_index=False,
+              grid_resolution=None, measure_memory=True, spatial_sort=None, workers=1):
+    """The benchmark() function runs every configuration and yields its results as a dictionary. Peak memory is
+    measured with tracemalloc in a second run, so that tracing does not slow down the timed run.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        polygon_file = os.path.join(directory, "polygon.csv")
+        input_file = os.path.join(directory, "input.csv")
+        output_file = os.path.join(directory, "output.csv")
+        for kind in polygon_kinds:
+            for n_vertices in vertex_counts:
+                rng = np.random.default_rng(seed)
+                polygon_xs, polygon_ys = make_polygon(kind, n_vertices, rng)
+                write_points_csv(polygon_file, polygon_xs, polygon_ys)
+                for distribution in distributions:
+                    for n_points in point_counts:
+                        xs, ys = make_points(distribution, n_points, polygon_xs, polygon_ys, rng)
+                        write_points_csv(input_file, xs, ys)
+
+                        timings, total, counts = run_pipeline(polygon_file, input_file, output_file, slab_index,
+                                                              grid_resolution, workers)
+                        peak_memory = None
+                        if measure_memory is True:
+                            tracemalloc.start()
+                            run_pipeline(polygon_file, input_file, output_file, slab_index, grid_resolution, workers)
+                            peak_memory = tracemalloc.get_traced_memory()[1]
+                            tracemalloc.stop()
+
+                        result = {"polygon": kind, "vertices": len(polygon_xs), "distribution": distribution,
+                                  "points": n_points, "slab_index": slab_index, "grid_resolution": grid_resolution,
+                                  "workers": workers, "seconds": timings, "total_seconds": total,
+                                  "points_per_second": n_points / total if total > 0 else None,
+                                  "peak_memory_bytes": peak_memory, "categories": counts}
+                        if spatial_sort is not None:
+                            result["spatial_sort"] = compare_spatial_sort(polygon_file, input_file, spatial_sort,
+                                                                          slab_index, grid_resolution, workers)
+                        yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the point-in-polygon classification pipeline.")
+    parser.add_argument("--polygons", nargs="+", default=list(POLYGON_KINDS), choices=POLYGON_KINDS)
+    parser.add_argument("--vertices", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--distributions", nargs="+", default=list(DISTRIBUTIONS), choices=DISTRIBUTIONS)
+    parser.add_argument("--points", nargs="+", type=int, default=[1000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slab-index", action="store_true", help="build the slab index on every polygon")
+    parser.add_argument("--grid", type=int, default=None, help="build a grid of this resolution on every polygon")
+    parser.add_argument("--spatial-sort", default=None, choices=SPATIAL_CURVES,
+                        help="also time the classification with the points sorted along this space-filling curve")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    parser.add_argument("--output", default=None, help="file to write the JSON lines to (default: print them)")
+    args = parser.parse_args(argv)
+
+    output_file = open(args.output, "w") if args.output else None
+    for result in benchmark(args.polygons, args.vertices, args.distributions, args.points, args.seed,
+                            args.slab_index, args.grid, not args.no_memory, args.spatial_sort, args.workers):
+        line = json.dumps(result)
+        if output_file is not None:
+            output_file.write(line + "\n")
+            output_file.flush()
+        else:
+            print(line, flush=True)
+    if output_file is not None:
+        output_file.close()
+    return None
+
+
+# If the whole file is executed:
+if __name__ == "__main__":
+    main()
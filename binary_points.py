@@ -0,0 +1,252 @@
+"""Binary columnar point format, so that large point archives are parsed from csv once and then memory-mapped.
+
+Layout of a file (all numbers little-endian):
+- header of 32 bytes: magic b"PIPPOINT", format version (uint32), width of the id column in bytes (uint32),
+  number of points (uint64), padding;
+- id column: one fixed-width, zero-padded UTF-8 string per point;
+- x column: one float64 per point, starting at the first multiple of 8 bytes after the id column;
+- y column: one float64 per point, directly after the x column.
+
+Classification results have a binary columnar format of their own:
+- header of 32 bytes: magic b"PIPCATEG", format version (uint32), width of the id column in bytes (uint32, 0 if
+  the file only holds the categories), number of points (uint64), padding;
+- category column: one category code (uint8) per point, in the order of the input points;
+- id column (if the width is not 0): one fixed-width, zero-padded UTF-8 string per point, starting at the first
+  multiple of 8 bytes after the category column.
+"""
+# Import numpy for the memory-mapped columns
+import numpy as np
+# Import struct for the file header
+import struct
+# Import sys module for the command line arguments
+import sys
+# Import islice for converting csv files in chunks
+from itertools import islice
+# Import tempfile for the ids of results written in chunks
+import tempfile
+
+MAGIC = b"PIPPOINT"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQ")
+_HEADER_SIZE = 32
+CATEGORIES_MAGIC = b"PIPCATEG"
+
+
+def _column_offsets(id_width, n_points):
+    """The _column_offsets() function returns the byte offsets of the id, x and y columns and the total file size."""
+    ids_offset = _HEADER_SIZE
+    xs_offset = -(-(ids_offset + id_width * n_points) // 8) * 8
+    ys_offset = xs_offset + 8 * n_points
+    return ids_offset, xs_offset, ys_offset, ys_offset + 8 * n_points
+
+
+def is_binary_points_file(file_path):
+    """The is_binary_points_file() function returns True if the file starts with the binary point format magic."""
+    with open(file_path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def open_binary_points(file_path):
+    """The open_binary_points() function memory-maps a binary point file and returns its id, x and y columns as
+    read-only arrays, without copying or parsing the data.
+    """
+    with open(file_path, "rb") as f:
+        magic, version, id_width, n_points = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(str(file_path) + " is not a binary point file of version " + str(VERSION))
+    ids_offset, xs_offset, ys_offset, size = _column_offsets(id_width, n_points)
+    if n_points == 0:
+        return np.zeros(0, dtype="S1"), np.zeros(0), np.zeros(0)
+    ids = np.memmap(file_path, dtype="S" + str(id_width), mode="r", offset=ids_offset, shape=(n_points,))
+    xs = np.memmap(file_path, dtype="<f8", mode="r", offset=xs_offset, shape=(n_points,))
+    ys = np.memmap(file_path, dtype="<f8", mode="r", offset=ys_offset, shape=(n_points,))
+    return ids, xs, ys
+
+
+def read_binary_points_in_chunks(file_path, chunk_size):
+    """The read_binary_points_in_chunks() function yields a binary point file chunk_size points at a time, as views of
+    the memory-mapped id, x and y columns, without decoding the ids.
+    """
+    ids, xs, ys = open_binary_points(file_path)
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size], xs[start:start + chunk_size], ys[start:start + chunk_size]
+
+
+def write_binary_points(file_path, names, xs, ys):
+    """The write_binary_points() function writes point names and x- and y-coordinates to a binary point file."""
+    encoded = [str(name).encode("utf-8") for name in names]
+    id_width = max([len(name) for name in encoded] + [1])
+    ids_offset, xs_offset, ys_offset, size = _column_offsets(id_width, len(encoded))
+    with open(file_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, id_width, len(encoded)).ljust(_HEADER_SIZE, b"\0"))
+        f.write(np.array(encoded, dtype="S" + str(id_width)).tobytes())
+        f.write(b"\0" * (xs_offset - f.tell()))
+        f.write(np.asarray(xs, dtype="<f8").tobytes())
+        f.write(np.asarray(ys, dtype="<f8").tobytes())
+
+
+class BinaryPointsWriter:
+    """Definition of the BinaryPointsWriter class, which writes a binary point file chunk by chunk, for inputs too
+    large to be held in memory.
+    The number of points and the width of the id column must be known beforehand, so that every chunk can be
+    written directly at its place in the id, x and y columns.
+    """
+    def __init__(self, file_path, n_points, id_width):
+        self.n_points = n_points
+        self.id_width = max(id_width, 1)
+        self.position = 0
+        self._offsets = _column_offsets(self.id_width, n_points)
+        self._file = open(file_path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, self.id_width, n_points).ljust(_HEADER_SIZE, b"\0"))
+        self._file.truncate(self._offsets[3])
+
+    def write(self, ids, xs, ys):
+        """The write() method writes the next chunk of points, given as an array of ids (bytes) and arrays of x- and
+        y-coordinates.
+        """
+        end = self.position + len(xs)
+        if end > self.n_points:
+            raise ValueError("More than " + str(self.n_points) + " points written")
+        ids_offset, xs_offset, ys_offset, size = self._offsets
+        self._file.seek(ids_offset + self.id_width * self.position)
+        self._file.write(np.asarray(ids, dtype="S" + str(self.id_width)).tobytes())
+        self._file.seek(xs_offset + 8 * self.position)
+        self._file.write(np.asarray(xs, dtype="<f8").tobytes())
+        self._file.seek(ys_offset + 8 * self.position)
+        self._file.write(np.asarray(ys, dtype="<f8").tobytes())
+        self.position = end
+
+    def close(self):
+        self._file.close()
+        if self.position != self.n_points:
+            raise ValueError("Only " + str(self.position) + " of " + str(self.n_points) + " points written")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        # After an error, the file is only closed, so that the error is not hidden by the count check
+        if exc_type is not None:
+            self._file.close()
+        else:
+            self.close()
+
+
+def convert_csv_to_binary(csv_file_path, binary_file_path, chunk_size=100000):
+    """The convert_csv_to_binary() function converts an id,x,y csv file into a binary point file. The csv file is
+    read twice: once to count the points and find the widest id, and once more chunk_size rows at a time to fill
+    the memory-mapped columns, so memory use does not depend on the size of the file.
+    The function returns the number of points converted.
+    """
+    n_points = 0
+    id_width = 1
+    with open(csv_file_path, "r") as f:
+        f.readline()
+        for line in f:
+            if line.strip():
+                n_points += 1
+                id_width = max(id_width, len(line.split(",", 1)[0].encode("utf-8")))
+
+    ids_offset, xs_offset, ys_offset, size = _column_offsets(id_width, n_points)
+    with open(binary_file_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, id_width, n_points).ljust(_HEADER_SIZE, b"\0"))
+        f.truncate(size)
+    if n_points == 0:
+        return 0
+
+    ids = np.memmap(binary_file_path, dtype="S" + str(id_width), mode="r+", offset=ids_offset, shape=(n_points,))
+    xs = np.memmap(binary_file_path, dtype="<f8", mode="r+", offset=xs_offset, shape=(n_points,))
+    ys = np.memmap(binary_file_path, dtype="<f8", mode="r+", offset=ys_offset, shape=(n_points,))
+    position = 0
+    with open(csv_file_path, "r") as f:
+        f.readline()
+        while True:
+            lines = [line for line in islice(f, chunk_size) if line.strip()]
+            if not lines:
+                break
+            rows = [line.split(",") for line in lines]
+            end = position + len(rows)
+            ids[position:end] = [items[0].encode("utf-8") for items in rows]
+            xs[position:end] = [float(items[1]) for items in rows]
+            ys[position:end] = [float(items[2]) for items in rows]
+            position = end
+    for column in (ids, xs, ys):
+        column.flush()
+    return n_points
+
+
+def is_binary_categories_file(file_path):
+    """The is_binary_categories_file() function returns True if the file starts with the binary results magic."""
+    with open(file_path, "rb") as f:
+        return f.read(len(CATEGORIES_MAGIC)) == CATEGORIES_MAGIC
+
+
+def open_binary_categories(file_path):
+    """The open_binary_categories() function memory-maps a binary results file and returns its id column (None if
+    the file only holds the categories) and its category column as read-only arrays.
+    """
+    with open(file_path, "rb") as f:
+        magic, version, id_width, n_points = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != CATEGORIES_MAGIC or version != VERSION:
+        raise ValueError(str(file_path) + " is not a binary results file of version " + str(VERSION))
+    if n_points == 0:
+        return (np.zeros(0, dtype="S1") if id_width else None), np.zeros(0, dtype=np.uint8)
+    categories = np.memmap(file_path, dtype=np.uint8, mode="r", offset=_HEADER_SIZE, shape=(n_points,))
+    ids = None
+    if id_width:
+        ids = np.memmap(file_path, dtype="S" + str(id_width), mode="r", offset=-(-(_HEADER_SIZE + n_points) // 8) * 8,
+                        shape=(n_points,))
+    return ids, categories
+
+
+class BinaryCategoriesWriter:
+    """Definition of the BinaryCategoriesWriter class, which writes classification results to a binary results
+    file chunk by chunk, with or without the ids of the points.
+    The categories are written as they come. The ids are kept in a temporary file until close(), because the width
+    of the id column is only known once all chunks have been written.
+    """
+    def __init__(self, file_path, with_ids=True):
+        self.n_points = 0
+        self.id_width = 1 if with_ids is True else 0
+        self._file = open(file_path, "wb")
+        self._file.write(b"\0" * _HEADER_SIZE)
+        # Chunks of ids as (width, count) and their bytes in the temporary file
+        self._id_chunks = []
+        self._ids = tempfile.TemporaryFile() if with_ids is True else None
+
+    def write(self, ids, categories):
+        """The write() method appends the category codes of a chunk of points, and their ids (an array of bytes)."""
+        self._file.write(np.asarray(categories, dtype=np.uint8).tobytes())
+        self.n_points += len(categories)
+        if self._ids is not None:
+            ids = np.asarray(ids, dtype=np.bytes_)
+            self.id_width = max(self.id_width, ids.dtype.itemsize)
+            self._id_chunks.append((ids.dtype.itemsize, len(ids)))
+            self._ids.write(ids.tobytes())
+
+    def close(self):
+        """The close() method appends the id column, padded to the widest id, and writes the header."""
+        if self._ids is not None:
+            self._file.write(b"\0" * (-self._file.tell() % 8))
+            self._ids.seek(0)
+            for width, count in self._id_chunks:
+                chunk = np.frombuffer(self._ids.read(width * count), dtype="S" + str(width))
+                self._file.write(chunk.astype("S" + str(self.id_width)).tobytes())
+            self._ids.close()
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(CATEGORIES_MAGIC, VERSION, self.id_width, self.n_points))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# If the whole file is executed, convert a csv file given on the command line (by default input.csv)
+if __name__ == "__main__":
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "input.csv"
+    binary_file = sys.argv[2] if len(sys.argv) > 2 else csv_file.rsplit(".", 1)[0] + ".pts"
+    print("Convert " + csv_file + " to " + binary_file)
+    convert_csv_to_binary(csv_file, binary_file)
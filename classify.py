@@ -0,0 +1,77 @@
+"""Headless command line entry point for batch classification, which only imports matplotlib for --plot-file.
+
+Example: python classify.py polygon.csv input.csv --workers 8 --chunk-size 1000000
+
+The time taken to import the geometry core is measured and printed, with a warning if it exceeds --startup-budget
+seconds, so that slow imports on batch workers are noticed without failing the job. With --check-startup, the
+command only measures the startup time, and fails if it exceeds the budget.
+"""
+# Import time first, so that the imports below are included in the measured startup time
+import time
+
+_start = time.perf_counter()
+
+# Import argparse for the command line options
+import argparse  # noqa: E402
+# Import json for printing the profile
+import json  # noqa: E402
+# Import sys module for the exit status
+import sys  # noqa: E402
+# Import the geometry core, which does not import matplotlib
+from main_from_file import main as classify_main, OUTPUT_FORMATS, SPATIAL_CURVES  # noqa: E402
+
+STARTUP_SECONDS = time.perf_counter() - _start
+# Default startup-time budget in seconds
+STARTUP_BUDGET = 0.5
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify points against a polygon without a GUI.")
+    parser.add_argument("polygon_file", nargs="?", help="csv file with the polygon vertices (id,x,y)")
+    parser.add_argument("input_file", nargs="?", help="csv or binary point file with the points to classify")
+    parser.add_argument("--output", default="output.csv", help="file to write the results to")
+    parser.add_argument("--output-format", default="csv", choices=OUTPUT_FORMATS,
+                        help="csv (id,category), binary (ids and category codes) or codes (category codes only)")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--spatial-sort", default=None, choices=SPATIAL_CURVES,
+                        help="classify the points in the order of this space-filling curve")
+    parser.add_argument("--chunk-size", type=int, default=None, help="stream the input in chunks of this many points")
+    parser.add_argument("--slab-index", action="store_true", help="build a slab index over the polygon edges")
+    parser.add_argument("--grid", type=int, default=None, help="build a pre-classified grid of this resolution")
+    parser.add_argument("--polygon-cache", action="store_true",
+                        help="load the prepared polygon from a cache file next to the polygon file, and keep it there")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time of every stage and the counts of points as a JSON line")
+    parser.add_argument("--profile-file", default=None,
+                        help="append the profile of the run as a JSON line to this file")
+    parser.add_argument("--plot-file", default=None, help="write a plot of the result to this PNG or SVG file")
+    parser.add_argument("--max-plot-points", type=int, default=100000,
+                        help="plot a random sample of this many points at most")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET,
+                        help="time in seconds for importing the geometry core above which a warning is printed")
+    parser.add_argument("--check-startup", action="store_true",
+                        help="only measure the startup time, and fail if it exceeds --startup-budget")
+    args = parser.parse_args(argv)
+    if args.check_startup is False and (args.polygon_file is None or args.input_file is None):
+        parser.error("the polygon_file and input_file arguments are required")
+
+    print("Startup: " + str(round(STARTUP_SECONDS * 1000, 1)) + " ms")
+    if STARTUP_SECONDS > args.startup_budget:
+        print("Warning: startup took longer than the budget of " + str(args.startup_budget) + " s", file=sys.stderr)
+    if args.check_startup is True:
+        return 1 if STARTUP_SECONDS > args.startup_budget else 0
+
+    stats = classify_main(args.polygon_file, args.input_file, display_result=False, slab_index=args.slab_index,
+                          grid_resolution=args.grid, chunk_size=args.chunk_size, workers=args.workers,
+                          plot_file=args.plot_file, max_plot_points=args.max_plot_points,
+                          polygon_cache=args.polygon_cache, profile=args.profile, profile_file=args.profile_file,
+                          output_file=args.output, output_format=args.output_format,
+                          spatial_sort=args.spatial_sort)
+    if args.profile is True:
+        print(json.dumps(stats.as_dict()))
+    return 0
+
+
+# If the whole file is executed:
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Incremental re-classification of points after some vertices of a polygon were edited.
+
+Only the edges that differ between the old and the new polygon (removed or added edges) can change the category
+of a point. The ray from a point crosses the edges both polygons share the same number of times, so the point
+changed from inside to outside or back only if its ray crosses the changed edges an odd number of times, i.e. if
+it lies in the region swept by the changed edges. Its boundary status only changed if it is on a changed edge.
+Only those points are classified again against the new polygon; every other point keeps its previous category.
+
+Example: python incremental.py polygon_old.csv polygon.csv input.csv output.csv --output output_new.csv
+"""
+# Import argparse for the command line options
+import argparse
+# Import numpy for the batch tests
+import numpy as np
+# Import the binary results format
+from binary_points import is_binary_categories_file, open_binary_categories
+# Import the geometry core from main_from_file
+from main_from_file import PointSet, read_polygon_from_file, classify_points, _boundary_chunk, \
+    _contains_chunk, CATEGORY_NAMES, OUTPUT_FORMATS
+
+
+def changed_edges(old_polygon, new_polygon):
+    """The changed_edges() function compares the edges of two polygons, and returns the ids of the edges of the old
+    polygon that are not in the new one (removed) and of the edges of the new polygon that are not in the old one
+    (added). An edge is the same if both its end points are the same, in the same order.
+    """
+    def edge_keys(polygon):
+        return list(zip(polygon.edge_ax.tolist(), polygon.edge_ay.tolist(), polygon.edge_bx.tolist(),
+                        polygon.edge_by.tolist()))
+
+    old_keys, new_keys = edge_keys(old_polygon), edge_keys(new_polygon)
+    old_set, new_set = set(old_keys), set(new_keys)
+    removed = np.array([i for i, key in enumerate(old_keys) if key not in new_set], dtype=np.intp)
+    added = np.array([i for i, key in enumerate(new_keys) if key not in old_set], dtype=np.intp)
+    return removed, added
+
+
+def affected_points(old_polygon, new_polygon, xs, ys, chunk_size=None):
+    """The affected_points() function returns a boolean array which is True for the points whose category may
+    differ between the old and the new polygon: the points inside the region swept by the changed edges, and the
+    points on a changed edge of either polygon.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    removed, added = changed_edges(old_polygon, new_polygon)
+    affected = np.zeros(xs.shape, dtype=bool)
+    if len(removed) == 0 and len(added) == 0:
+        return affected
+    step = chunk_size if chunk_size is not None else max(1, 2 ** 20 // (len(removed) + len(added)))
+    for start in range(0, len(xs), step):
+        px, py = xs[start:start + step][:, None], ys[start:start + step][:, None]
+        # An odd number of crossings with the changed edges means the point is inside exactly one of the polygons
+        swept = _contains_chunk(old_polygon, px, py, removed) != _contains_chunk(new_polygon, px, py, added)
+        on_changed = _boundary_chunk(old_polygon, px, py, removed) | _boundary_chunk(new_polygon, px, py, added)
+        affected[start:start + step] = swept | on_changed
+    return affected
+
+
+def read_categories_from_file(file_path):
+    """The read_categories_from_file() function reads an id,category csv file, as written by main_from_file.main,
+    and returns the ids as an array of bytes and the category codes as an array of uint8. Binary results files are
+    memory-mapped instead; their ids are None if the file only holds the category codes.
+    """
+    if is_binary_categories_file(file_path):
+        return open_binary_categories(file_path)
+    codes = {name: code for code, name in enumerate(CATEGORY_NAMES)}
+    ids, categories = [], []
+    with open(file_path, "r") as f:
+        f.readline()
+        for line in f:
+            if line.strip():
+                name, category = line.rstrip("\n").rsplit(",", 1)
+                ids.append(name.encode("utf-8"))
+                categories.append(codes[category])
+    return np.array(ids, dtype=np.bytes_), np.array(categories, dtype=np.uint8)
+
+
+def reclassify(old_polygon, new_polygon, points, previous_categories):
+    """The reclassify() function takes the old and new polygon, a PointSet and the categories of its points
+    against the old polygon, sets the categories of the points against the new polygon, classifying only the
+    affected points again, and returns the indices of the points that were classified again.
+    """
+    points.categories[:] = previous_categories
+    index = np.flatnonzero(affected_points(old_polygon, new_polygon, points.xs, points.ys))
+    points.categories[index] = classify_points(new_polygon, points.xs[index], points.ys[index])
+    return index
+
+
+def main(old_polygon_file, new_polygon_file, input_points_file, previous_output_file, output_file="output.csv",
+         output_format="csv"):
+    print("Read " + str(old_polygon_file) + " and " + str(new_polygon_file))
+    old_polygon = read_polygon_from_file(old_polygon_file)
+    new_polygon = read_polygon_from_file(new_polygon_file)
+    removed, added = changed_edges(old_polygon, new_polygon)
+    print(str(len(removed)) + " edges removed, " + str(len(added)) + " edges added")
+
+    print("Read " + str(input_points_file) + " and " + str(previous_output_file))
+    points = PointSet.from_file(input_points_file)
+    previous_ids, previous_categories = read_categories_from_file(previous_output_file)
+    # The previous results must be for the same points, in the same order
+    if len(previous_categories) != len(points) or \
+            (previous_ids is not None and not np.array_equal(previous_ids, points.ids)):
+        raise ValueError(str(previous_output_file) + " does not hold the results of the points in " +
+                         str(input_points_file))
+
+    print("Categorize affected points")
+    index = reclassify(old_polygon, new_polygon, points, previous_categories)
+    changed = np.count_nonzero(points.categories[index] != previous_categories[index])
+    print("Classified " + str(len(index)) + " of " + str(len(points)) + " points again, " + str(changed) +
+          " changed category")
+
+    print("Write " + str(output_file))
+    points.write(output_file, output_format)
+    return None
+
+
+# If the whole file is executed, read the files given on the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify again only the points affected by a polygon edit.")
+    parser.add_argument("old_polygon_file", help="csv file with the polygon vertices before the edit")
+    parser.add_argument("new_polygon_file", help="csv file with the polygon vertices after the edit")
+    parser.add_argument("input_file", help="csv or binary point file with the points")
+    parser.add_argument("previous_output_file", help="csv or binary results file with the results for the old polygon")
+    parser.add_argument("--output", default="output.csv", help="file to write the updated results to")
+    parser.add_argument("--output-format", default="csv", choices=OUTPUT_FORMATS, help="format of the results")
+    args = parser.parse_args()
+    main(args.old_polygon_file, args.new_polygon_file, args.input_file, args.previous_output_file, args.output,
+         args.output_format)
@@ -1,47 +1,34 @@
-# Import modules for the Plotter class
-from collections import OrderedDict
-import matplotlib
-import matplotlib.pyplot as plt
-# Import sys module for the RCA algorithm in the Polygon class
-import sys
+# Import numpy for the batch classification of many points at once
+import numpy as np
+# Import math and bisect for the wedge search of convex polygons
+import math
+from bisect import bisect_right
+# Import islice for reading input files in chunks
+from itertools import islice
+# Import multiprocessing for classifying chunks of points on several cores
+import multiprocessing
+# Import hashlib, struct, OrderedDict and threading for the classification cache
+import hashlib
+import struct
+from collections import OrderedDict, deque
+import threading
+# Import json, time and contextmanager for the pipeline statistics
+import json
+import time
+from contextlib import contextmanager, nullcontext
+# Import the binary point format, which is read memory-mapped instead of parsed
+from binary_points import is_binary_points_file, open_binary_points, read_binary_points_in_chunks, \
+    BinaryCategoriesWriter
 
-matplotlib.use("TkAgg")
 
-
-class Plotter:
-    """Definition of the Plotter class, used to plot the polygon, the MBR and the points."""
-    def __init__(self):
-        plt.figure()
-
-    def add_polygon(self, xs, ys):
-        plt.fill(xs, ys, "lightgray", label="Polygon", lw=2, zorder=0)
-
-    # This method plots the MBR
-    def add_mbr(self, xs, ys):
-        plt.plot(xs, ys, "deepskyblue", label="MBR", linestyle="--", lw=1.4)
-
-    def add_point(self, x, y, kind=None):
-        if kind == "outside":
-            plt.plot(x, y, "ro", label="Outside")
-        elif kind == "boundary":
-            plt.plot(x, y, "bo", label="Boundary")
-        elif kind == "inside":
-            plt.plot(x, y, "go", label="Inside")
-        else:
-            plt.plot(x, y, "ko", label="Unclassified")
-
-    # This method plots the ray from a point of interest
-    def add_ray(self, x, y, max_x_input):
-        """The add_ray() method plots a horizontal ray from the specified point."""
-        xs = [x, max_x_input + 1]
-        ys = [y, y]
-        plt.plot(xs, ys, label="Ray", linewidth=0.4,  color="black")
-
-    def show(self):
-        handles, labels = plt.gca().get_legend_handles_labels()
-        by_label = OrderedDict(zip(labels, handles))
-        plt.legend(by_label.values(), by_label.keys())
-        plt.show()
+def __getattr__(name):
+    """Plotter is imported from the plotter module only when it is asked for, so that the geometry core can be
+    imported (and batch runs can start) without matplotlib.
+    """
+    if name == "Plotter":
+        from plotter import Plotter
+        return Plotter
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
 
 
 class Point:
@@ -55,26 +42,457 @@ class Point:
         self.y = y
 
 
+def polygon_fingerprint(points, ring_sizes=None):
+    """The polygon_fingerprint() function returns a hash of the coordinates of a list of polygon vertices, which
+    changes whenever a vertex is added, removed or moved. For a polygon of several rings, the number of vertices
+    in every ring is hashed too.
+    """
+    digest = hashlib.sha256()
+    for point in points:
+        digest.update(struct.pack("<dd", point.x, point.y))
+    if ring_sizes is not None and len(ring_sizes) > 1:
+        digest.update(struct.pack("<" + str(len(ring_sizes)) + "Q", *ring_sizes))
+    return digest.hexdigest()
+
+
+class SlabIndex:
+    """Definition of the SlabIndex class, a horizontal slab index over the edges of a polygon.
+    The plane is cut into slabs at every distinct y-coordinate of the polygon vertices, and each slab keeps the
+    edges whose y-range, widened by the boundary tolerance of the edge, overlaps it (slabs and y-ranges are both
+    closed). A query at height y then only needs the edges of the one slab containing y, instead of every edge of
+    the polygon. Heights within the largest boundary tolerance below or above the polygon belong to the first or
+    last slab, as points there can still be on the boundary.
+    An edge spanning many vertex heights is kept in every slab it overlaps, which takes memory growing with the
+    square of the number of vertices for shapes such as stars. If the index would hold more than
+    MAX_ENTRIES_PER_EDGE entries per edge, neighbouring slabs are merged in pairs until it does not.
+    """
+    MAX_ENTRIES_PER_EDGE = 16
+
+    def __init__(self, polygon):
+        # Slab k lies between slab_ys[k] and slab_ys[k + 1]
+        self.slab_ys = np.unique(np.concatenate((polygon.edge_y_min, polygon.edge_y_max)))
+        self.max_edge_tol = polygon.max_edge_tol
+        low, high = polygon.edge_y_min - polygon.edge_tol, polygon.edge_y_max + polygon.edge_tol
+        while True:
+            n_slabs = max(len(self.slab_ys) - 1, 1)
+            # First and last slab overlapped by every widened edge
+            first = np.clip(np.searchsorted(self.slab_ys, low, side="left") - 1, 0, n_slabs - 1)
+            last = np.clip(np.searchsorted(self.slab_ys, high, side="right") - 1, 0, n_slabs - 1)
+            counts = last - first + 1
+            if int(counts.sum()) <= self.MAX_ENTRIES_PER_EDGE * len(low) or n_slabs == 1:
+                break
+            # Every other slab boundary is dropped, keeping the lowest and the highest
+            self.slab_ys = np.append(self.slab_ys[:-1:2], self.slab_ys[-1])
+
+        # Edge ids of slab k are edge_ids[offsets[k]:offsets[k + 1]], in the same order as the polygon edges
+        edge_of_entry = np.repeat(np.arange(len(first)), counts)
+        slab_of_entry = np.repeat(first - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        order = np.argsort(slab_of_entry, kind="stable")
+        self.edge_ids = edge_of_entry[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(slab_of_entry, minlength=n_slabs))))
+        self.edge_ids.flags.writeable = False
+        self.offsets.flags.writeable = False
+        # Per slab tuples of the polygon's precomputed rows, only built by _build_rows() on the first per-point
+        # query, as the batch functions do not use them
+        self._polygon = polygon
+        self._rows = None
+
+    def _build_rows(self):
+        """The _build_rows() method builds per slab tuples of the polygon's precomputed rows from edge_ids and
+        offsets, so that per-point queries allocate nothing.
+        """
+        polygon_contains_rows, polygon_boundary_rows = self._polygon._contains_rows, self._polygon._boundary_rows
+        edge_ids, offsets = self.edge_ids.tolist(), self.offsets.tolist()
+        contains_rows = []
+        boundary_rows = []
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            ids = edge_ids[start:end]
+            contains_rows.append(tuple(polygon_contains_rows[i] for i in ids))
+            boundary_rows.append(tuple(polygon_boundary_rows[i] for i in ids))
+        self._rows = (contains_rows, boundary_rows)
+
+    def slab_of(self, y):
+        """The slab_of() method returns the number of the slab containing height y, or -1 if y is further than the
+        largest boundary tolerance below or above every slab.
+        """
+        if y < self.slab_ys[0] - self.max_edge_tol or y > self.slab_ys[-1] + self.max_edge_tol:
+            return -1
+        return min(max(int(np.searchsorted(self.slab_ys, y, side="right")) - 1, 0), len(self.offsets) - 2)
+
+    def contains_rows_at(self, y):
+        """The contains_rows_at() method returns the precomputed contains() rows of the edges in the slab of y."""
+        k = self.slab_of(y)
+        if k < 0:
+            return ()
+        if self._rows is None:
+            self._build_rows()
+        return self._rows[0][k]
+
+    def boundary_rows_at(self, y):
+        """The boundary_rows_at() method returns the precomputed boundary() rows of the edges in the slab of y."""
+        k = self.slab_of(y)
+        if k < 0:
+            return ()
+        if self._rows is None:
+            self._build_rows()
+        return self._rows[1][k]
+
+    def slabs_of(self, ys):
+        """The slabs_of() method is the array version of slab_of(): it returns the slab number of every height in ys."""
+        slabs = np.clip(np.searchsorted(self.slab_ys, ys, side="right") - 1, 0, len(self.offsets) - 2)
+        return np.where((ys < self.slab_ys[0] - self.max_edge_tol) | (ys > self.slab_ys[-1] + self.max_edge_tol), -1,
+                        slabs)
+
+    def slab_edge_ids(self, k):
+        """The slab_edge_ids() method returns an array with the ids of the edges overlapping slab k."""
+        return self.edge_ids[self.offsets[k]:self.offsets[k + 1]]
+
+
+class GridIndex:
+    """Definition of the GridIndex class, a uniform grid of resolution x resolution cells over the MBR of a polygon.
+    Every cell is precomputed as INSIDE, OUTSIDE or CROSSED (an edge passes through or near it). Points in an
+    INSIDE or OUTSIDE cell are answered from the grid; only points in CROSSED cells need the exact tests.
+    The lookups and hits counters record how many points were looked up and how many were answered by the grid.
+    """
+    CROSSED = 255
+
+    def __init__(self, polygon, resolution=64, margin=0.01):
+        self.resolution = resolution
+        self.min_x, self.min_y = polygon.min_x, polygon.min_y
+        # A degenerate MBR still gets cells of non-zero size
+        self.cell_w = (polygon.max_x - polygon.min_x) / resolution or 1.0
+        self.cell_h = (polygon.max_y - polygon.min_y) / resolution or 1.0
+        self.lookups = 0
+        self.hits = 0
+
+        # Mark the cells crossed by every edge, with cells widened by margin (a fraction of the cell size), and at
+        # least by the largest boundary tolerance of the edges, so that points close enough to an edge to be
+        # classified as boundary always fall into a crossed cell.
+        # Each edge adds a range of rows per column to a difference array, which is summed up at the end.
+        max_tol = float(polygon.edge_tol.max()) if len(polygon.edge_tol) else 0.0
+        pad_x, pad_y = max(margin * self.cell_w, max_tol), max(margin * self.cell_h, max_tol)
+        diff = np.zeros((resolution, resolution + 1), dtype=np.int32)
+        columns = np.arange(resolution)
+        for a_x, a_y, b_x, b_y in zip(polygon.edge_ax.tolist(), polygon.edge_ay.tolist(),
+                                      polygon.edge_bx.tolist(), polygon.edge_by.tolist()):
+            if a_x > b_x:
+                a_x, a_y, b_x, b_y = b_x, b_y, a_x, a_y
+            first, last = self._cell_range(a_x - pad_x, b_x + pad_x, self.min_x, self.cell_w)
+            cols = columns[first:last + 1]
+            # Part of the edge inside each widened column, clipped to the edge itself
+            x0 = np.clip(self.min_x + cols * self.cell_w - pad_x, a_x, b_x)
+            x1 = np.clip(self.min_x + (cols + 1) * self.cell_w + pad_x, a_x, b_x)
+            if b_x != a_x:
+                slope = (b_y - a_y) / (b_x - a_x)
+                y0, y1 = a_y + (x0 - a_x) * slope, a_y + (x1 - a_x) * slope
+            else:
+                y0, y1 = np.full(len(cols), a_y), np.full(len(cols), b_y)
+            rows_first = np.floor((np.minimum(y0, y1) - pad_y - self.min_y) / self.cell_h).astype(np.int64)
+            rows_last = np.floor((np.maximum(y0, y1) + pad_y - self.min_y) / self.cell_h).astype(np.int64)
+            np.add.at(diff, (cols, np.clip(rows_first, 0, resolution)), 1)
+            np.add.at(diff, (cols, np.clip(rows_last + 1, 0, resolution)), -1)
+        crossed = np.cumsum(diff, axis=1)[:, :resolution].T > 0
+
+        # Cells that no edge passes through are entirely inside or entirely outside, so the cell centre decides.
+        # For each row, the x-coordinates where the horizontal line through the centres crosses the edges are
+        # sorted, and a centre is inside if an odd number of crossings lies to its right.
+        centres_x = self.min_x + (columns + 0.5) * self.cell_w
+        self.cells = np.full((resolution, resolution), OUTSIDE, dtype=np.uint8)
+        for row in range(resolution):
+            centre_y = self.min_y + (row + 0.5) * self.cell_h
+            spans = (polygon.edge_ay > centre_y) != (polygon.edge_by > centre_y)
+            x_cross = np.sort(polygon.edge_ax[spans] + (centre_y - polygon.edge_ay[spans]) *
+                              polygon.edge_inv_slope[spans])
+            n_right = len(x_cross) - np.searchsorted(x_cross, centres_x, side="right")
+            self.cells[row] = np.where(n_right % 2 == 1, INSIDE, OUTSIDE)
+        self.cells[crossed] = self.CROSSED
+        self.cells.flags.writeable = False
+
+    def _cell_range(self, low, high, origin, size):
+        """The _cell_range() method returns the first and last cell numbers overlapped by the interval [low, high]."""
+        first = min(max(int((low - origin) // size), 0), self.resolution - 1)
+        last = min(max(int((high - origin) // size), 0), self.resolution - 1)
+        return first, last
+
+    def cell_state(self, x, y):
+        """The cell_state() method returns INSIDE, OUTSIDE or CROSSED for the cell containing a point inside the MBR.
+        Points just outside the MBR (within the boundary tolerance) get the state of the nearest cell.
+        """
+        column = min(max(int((x - self.min_x) // self.cell_w), 0), self.resolution - 1)
+        row = min(max(int((y - self.min_y) // self.cell_h), 0), self.resolution - 1)
+        self.lookups += 1
+        state = int(self.cells[row, column])
+        if state != self.CROSSED:
+            self.hits += 1
+        return state
+
+    def cell_states(self, xs, ys):
+        """The cell_states() method is the array version of cell_state() for many points inside the MBR."""
+        columns = np.clip(((xs - self.min_x) // self.cell_w).astype(np.int64), 0, self.resolution - 1)
+        rows = np.clip(((ys - self.min_y) // self.cell_h).astype(np.int64), 0, self.resolution - 1)
+        states = self.cells[rows, columns]
+        self.lookups += len(states)
+        self.hits += int(np.count_nonzero(states != self.CROSSED))
+        return states
+
+    @property
+    def hit_rate(self):
+        """The hit_rate() method returns the fraction of looked up points that were answered by the grid."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
 class Polygon:
     """Definition of the Polygon class.
-    Polygon object class has 1 required attribute: list of points, in clockwise order.
+    Polygon object class has 1 required attribute: list of points, in clockwise order (the orientation is checked
+    at construction and kept in is_clockwise, and both orientations are classified correctly).
+    Convex polygons are detected at construction (is_convex) and use a binary-search wedge test in O(log V) per
+    point instead of testing all V edges.
+    A polygon can have several rings, e.g. an outer ring and holes: points then holds the vertices of all rings one
+    ring after the other, and ring_sizes the number of vertices in every ring (see from_rings()). The edges of all
+    rings are classified together with the even-odd rule, so a point inside a hole is outside the polygon, and the
+    edges of the holes are part of the boundary.
+    A point counts as on the boundary if its distance to an edge is at most the larger of abs_tol and rel_tol times
+    the length of that edge.
     """
-    def __init__(self, points):
+    def __init__(self, points, abs_tol=1e-9, rel_tol=1e-9, ring_sizes=None):
         self.points = points
+        self.abs_tol = abs_tol
+        self.rel_tol = rel_tol
+        # Empty rings have no edges, so they are left out
+        self.ring_sizes = [size for size in ring_sizes if size > 0] if ring_sizes is not None else [len(points)]
+        if sum(self.ring_sizes) != len(points):
+            raise ValueError("The ring sizes do not add up to the number of vertices")
+        # Hash of the vertices, which identifies the polygon in a ClassificationCache
+        self.fingerprint = polygon_fingerprint(points, self.ring_sizes)
+        self._build_edge_table()
+        # Optional slab index over the edges, built by build_slab_index()
+        self.slab_index = None
+        # Optional grid of pre-classified cells over the MBR, built by build_grid()
+        self.grid = None
+
+    def _build_edge_table(self):
+        """The _build_edge_table() method precomputes everything about the polygon edges that does not depend on
+        the point-of-interest, so that contains(), boundary() and classify_points() do not rebuild it per query.
+        Edge i goes from vertex i (A) to vertex i + 1 (B), and the last vertex of a ring is joined to the first
+        vertex of the same ring. The arrays are read-only.
+        """
+        ax = np.array(self.x_vertices(), dtype=np.float64)
+        ay = np.array(self.y_vertices(), dtype=np.float64)
+        sizes = np.array(self.ring_sizes, dtype=np.intp)
+        ring_ends = np.cumsum(sizes)
+        next_vertex = np.arange(1, len(ax) + 1)
+        next_vertex[ring_ends - 1] = ring_ends - sizes
+        bx = ax[next_vertex]
+        by = ay[next_vertex]
+        dx = bx - ax
+        dy = by - ay
+        # Inverse slope (dx/dy) gives the x-coordinate where a horizontal line crosses the edge; horizontal edges
+        # are never crossed by a horizontal ray, so their inverse slope is set to 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_slope = np.where(dy != 0, dx / dy, 0.0)
+        self.edge_ax, self.edge_ay, self.edge_bx, self.edge_by = ax, ay, bx, by
+        self.edge_inv_slope = inv_slope
+        self.edge_y_min = np.minimum(ay, by)
+        self.edge_y_max = np.maximum(ay, by)
+        self.edge_length = np.hypot(dx, dy)
+        # Distance from an edge within which a point is on the boundary, and the same bound on the cross product
+        # of the edge and the line from A to the point, which is the distance times the length of the edge
+        self.edge_tol = np.maximum(self.abs_tol, self.rel_tol * self.edge_length)
+        self.edge_cross_tol = self.edge_tol * self.edge_length
+        for array in (ax, ay, bx, by, inv_slope, self.edge_y_min, self.edge_y_max, self.edge_length, self.edge_tol,
+                      self.edge_cross_tol):
+            array.flags.writeable = False
+        # Rows of plain floats for the per-point methods, only built by _build_rows() when they are first used
+        self._rows = None
+
+        # Coordinates of the MBR, and the largest boundary tolerance, by which a point outside the MBR can still
+        # be on the boundary
+        self.min_x, self.max_x = float(ax.min()), float(ax.max())
+        self.min_y, self.max_y = float(ay.min()), float(ay.max())
+        self.max_edge_tol = float(self.edge_tol.max())
+        self._detect_convexity()
+
+    def _build_rows(self):
+        """The _build_rows() method builds the rows of plain floats for the per-point methods from the edge arrays."""
+        ax, ay, bx, by = self.edge_ax, self.edge_ay, self.edge_bx, self.edge_by
+        # (A x, A y, B y, inverse slope) for contains()
+        contains_rows = tuple(zip(ax.tolist(), ay.tolist(), by.tolist(), self.edge_inv_slope.tolist()))
+        # (A x, A y, B x - A x, B y - A y, bounding box of the edge widened by the tolerance, cross product bound)
+        tol = self.edge_tol
+        boundary_rows = tuple(zip(ax.tolist(), ay.tolist(), (bx - ax).tolist(), (by - ay).tolist(),
+                                  (np.minimum(ax, bx) - tol).tolist(), (np.maximum(ax, bx) + tol).tolist(),
+                                  (self.edge_y_min - tol).tolist(), (self.edge_y_max + tol).tolist(),
+                                  self.edge_cross_tol.tolist()))
+        self._rows = (contains_rows, boundary_rows)
+
+    @property
+    def _contains_rows(self):
+        """The _contains_rows() method returns the contains() rows of all edges, building them on first use."""
+        if self._rows is None:
+            self._build_rows()
+        return self._rows[0]
+
+    @property
+    def _boundary_rows(self):
+        """The _boundary_rows() method returns the boundary() rows of all edges, building them on first use."""
+        if self._rows is None:
+            self._build_rows()
+        return self._rows[1]
+
+    def _detect_convexity(self):
+        """The _detect_convexity() method finds the orientation of the vertices from the sign of the polygon area
+        (is_clockwise), and whether the polygon is convex (is_convex). Convex polygons get a fan of their vertices
+        in counter-clockwise order, without repeated vertices, around a centre inside the polygon, so that
+        contains() and boundary() can find the wedge of the fan containing a point by binary search instead of
+        testing every edge.
+        For a polygon of several rings, the area and orientation are those of the first ring, and the polygon is
+        never convex.
+        """
+        first_ring = slice(0, self.ring_sizes[0])
+        ax, ay = self.edge_ax[first_ring], self.edge_ay[first_ring]
+        bx, by = self.edge_bx[first_ring], self.edge_by[first_ring]
+        # Shoelace formula: the signed area is negative for clockwise vertices
+        self.signed_area = float(np.sum(ax * by - bx * ay) / 2)
+        self.is_clockwise = self.signed_area < 0
+        self.is_convex = False
+        self._hull_x = self._hull_y = self._hull_rows = self._hull_table = None
+        self._hull_centre = self._hull_angles = None
+        if len(self.ring_sizes) > 1:
+            return
+
+        # Vertices repeating the next vertex (edges of zero length) do not change the shape
+        keep = (ax != bx) | (ay != by)
+        xs, ys = ax[keep], ay[keep]
+        if len(xs) < 3:
+            return
+        # Turn at every vertex, from the incoming to the outgoing edge. Vertices where the polygon goes straight on
+        # are kept, so that every edge of the fan is an edge of the polygon with the same tolerance, but a vertex
+        # where the polygon turns back on itself makes it degenerate
+        in_x, in_y = xs - np.roll(xs, 1), ys - np.roll(ys, 1)
+        out_x, out_y = np.roll(xs, -1) - xs, np.roll(ys, -1) - ys
+        cross = in_x * out_y - in_y * out_x
+        dot = in_x * out_x + in_y * out_y
+        if np.any((cross == 0) & (dot < 0)):
+            return
+        turns = cross[cross != 0]
+        if len(turns) < 3:
+            return
+        # A convex polygon turns the same way at every vertex, and only once around in total (which rules out
+        # self-intersecting shapes such as a pentagram)
+        if not (np.all(turns > 0) or np.all(turns < 0)):
+            return
+        if abs(abs(np.sum(np.arctan2(cross, dot))) - 2 * np.pi) > 1e-6:
+            return
+        if turns[0] < 0:
+            xs, ys = xs[::-1], ys[::-1]
+        self._set_fan(xs, ys)
+
+    def _set_fan(self, xs, ys):
+        """The _set_fan() method marks the polygon as convex, with the fan vertices given as arrays xs and ys.
+        The centre of the fan is the mean of the vertices, which is strictly inside a convex polygon. Every vertex,
+        including the vertices where the polygon goes straight on, is then at its own angle around the centre, so
+        that every wedge of the fan is closed by exactly one edge of the polygon.
+        """
+        self.is_convex = True
+        centre_x, centre_y = float(np.mean(xs)), float(np.mean(ys))
+        # Angles of the vertices around the centre, counter-clockwise from fan vertex 0, in [0, 2 pi); the centre
+        # is kept with the angle of fan vertex 0 from it
+        angles = np.arctan2(ys - centre_y, xs - centre_x)
+        self._hull_centre = (centre_x, centre_y, float(angles[0]))
+        angles = np.mod(angles - angles[0], 2 * np.pi)
+        angles[0] = 0.0
+        angles.flags.writeable = False
+        self._hull_angles = angles
+        # Fan vertices as plain floats, and boundary rows (as in _boundary_rows) of the edges between them, where
+        # edge i goes from fan vertex i to fan vertex i + 1
+        self._hull_x, self._hull_y = xs.tolist(), ys.tolist()
+        next_x, next_y = np.roll(xs, -1), np.roll(ys, -1)
+        dx, dy = next_x - xs, next_y - ys
+        length = np.hypot(dx, dy)
+        tol = np.maximum(self.abs_tol, self.rel_tol * length)
+        self._hull_rows = tuple(zip(xs.tolist(), ys.tolist(), dx.tolist(), dy.tolist(),
+                                    (np.minimum(xs, next_x) - tol).tolist(), (np.maximum(xs, next_x) + tol).tolist(),
+                                    (np.minimum(ys, next_y) - tol).tolist(), (np.maximum(ys, next_y) + tol).tolist(),
+                                    (tol * length).tolist()))
+        # The same rows as a read-only array, for the batch functions
+        self._hull_table = np.array(self._hull_rows, dtype=np.float64)
+        self._hull_table.flags.writeable = False
+
+    def _convex_wedge(self, x, y):
+        """The _convex_wedge() method takes the coordinates of a point and returns the index i of the wedge of the
+        fan, between the rays from the centre through fan vertices i and i + 1 (fan vertex 0 after the last one),
+        that contains the point. The wedge is found by binary search over the angles of the fan vertices.
+        """
+        centre_x, centre_y, start = self._hull_centre
+        angle = (math.atan2(y - centre_y, x - centre_x) - start) % (2 * math.pi)
+        return bisect_right(self._hull_angles, angle) - 1
+
+    def _convex_contains(self, x, y):
+        """The _convex_contains() method returns True if the point (x, y) is inside the convex polygon: on the inner
+        side of the polygon edge that closes its wedge of the fan.
+        """
+        a_x, a_y, d_x, d_y = self._hull_rows[self._convex_wedge(x, y)][:4]
+        # bool() so that the result is a plain bool even for numpy coordinates, as callers compare it with "is True"
+        return bool(d_x * (y - a_y) - d_y * (x - a_x) > 0)
+
+    def _convex_boundary_rows(self, x, y):
+        """The _convex_boundary_rows() method returns the boundary rows of the only fan edges a point (x, y) can lie
+        on: the edge closing its wedge and the two edges next to it.
+        """
+        rows = self._hull_rows
+        i = self._convex_wedge(x, y)
+        return [rows[i - 1], rows[i], rows[(i + 1) % len(rows)]]
+
+    def build_slab_index(self):
+        """The build_slab_index() method builds a SlabIndex over the polygon edges, which contains() and boundary()
+        and classify_points() then use to examine only the edges whose y-range spans the point. The method returns
+        the polygon, and the index is only built once.
+        """
+        if self.slab_index is None:
+            self.slab_index = SlabIndex(self)
+        return self
+
+    def build_grid(self, resolution=64):
+        """The build_grid() method builds a GridIndex of resolution x resolution cells over the MBR, which
+        classify_points() then uses to answer points in cells that are entirely inside or outside the polygon
+        without any edge tests. The method returns the polygon.
+        """
+        if self.grid is None or self.grid.resolution != resolution:
+            self.grid = GridIndex(self, resolution)
+        return self
 
     @property
     def edges(self):
         """The edges() method returns a list of tuples, where each tuple contains 2 endpoints of a polygon edge"""
         edge_list = []
-        # For every point on the list of polygon points, take this point and the next point on the list, and
+        # For every point on the list of points of a ring, take this point and the next point on the list, and
         # make a tuple containing the coordinates of both of these points
-        for i, p in enumerate(self.points):
-            p1 = p
-            p2 = self.points[(i + 1) % len(self.points)]
-            # Append the tuple with 2 points to the list edge_list
-            edge_list.append((p1, p2))
+        for ring in self.rings:
+            for i, p in enumerate(ring):
+                p1 = p
+                p2 = ring[(i + 1) % len(ring)]
+                # Append the tuple with 2 points to the list edge_list
+                edge_list.append((p1, p2))
         return edge_list
 
+    @property
+    def rings(self):
+        """The rings() method returns the vertices of the polygon as a list of rings, each a list of points."""
+        rings = []
+        start = 0
+        for size in self.ring_sizes:
+            rings.append(self.points[start:start + size])
+            start += size
+        return rings
+
+    @classmethod
+    def from_rings(cls, rings, abs_tol=1e-9, rel_tol=1e-9):
+        """The from_rings() method takes a list of rings, each a list of points (e.g. an outer ring and its
+        holes), and returns a Polygon of all the rings.
+        """
+        rings = [list(ring) for ring in rings]
+        return cls([point for ring in rings for point in ring], abs_tol, rel_tol, [len(ring) for ring in rings])
+
     def x_vertices(self):
         """The vertex_xs() method returns a list of x-coordinates of the polygon vertices"""
         xs = []
@@ -101,104 +519,74 @@ class Polygon:
             is_inside_mbr = True
         return is_inside_mbr
 
+    def classify(self, point):
+        """The classify() method takes a point and returns its category code (OUTSIDE, BOUNDARY or INSIDE), checking
+        the MBR (widened by the boundary tolerance), the boundary and then the ray casting test once each.
+        """
+        tol = self.max_edge_tol
+        if self.mbr_contains(point, self.min_x - tol, self.max_x + tol, self.min_y - tol, self.max_y + tol) is False:
+            return OUTSIDE
+        if self.boundary(point) is True:
+            return BOUNDARY
+        if self.contains(point) is True:
+            return INSIDE
+        return OUTSIDE
+
     def contains(self, point):
         """The polygon_contains() method takes a point-of-interest (POI), implements the RCA and returns True if
         the POI is inside the polygon.
+        An edge is crossed by the horizontal ray from the POI if exactly one of its end points lies above the ray
+        (half-open rule: an end point at the height of the ray counts as below it) and the edge crosses the ray to
+        the right of the POI. A vertex at the height of the ray is therefore counted exactly once, without moving
+        the POI, and the method does not change the point it is given.
         References:
         - Lemons, Phillip, Ray casting algorithm: http://philliplemons.com/posts/ray-casting-algorithm;
         - Rosettacode.org, Ray casting algorithm, Python: https://rosettacode.org/wiki/Ray-casting_algorithm.
         """
-
-        # _huge acts as infinity if there is division by 0
-        _huge = sys.float_info.max
-        # _eps is used in cases where POI has the same y-coordinate as A or B
-        _eps = 0.00001
-
+        x, y = point.x, point.y
+        # A convex polygon only needs the binary search for the wedge of its fan containing POI
+        if self.is_convex is True:
+            return self._convex_contains(x, y)
         is_inside_polygon = False
         # Start on the outside of the polygon, and consider one polygon edge at a time
-        for edge in self.edges:
-            # name the 2 end points of the edge A and B
-            a, b = edge[0], edge[1]
-            # make sure A is lower than B
-            if a.y > b.y:
-                a, b = b, a
-
-            # Make sure POI does not have the same y-coordinate as one of the edge points
-            if point.y == a.y or point.y == b.y:
-                # If POI has the same y-coordinate as A or B, increase the y-coordinate of POI by a small number
-                point.y += _eps
-
-            # If the x-coordinate of POI is greater than x-coordinate of both A and B, or if then the horizontal ray
-            # does not intersect with the edge; same goes for if the y-coordinate of POI is greater than y-coordinate
-            # of B or smaller than y-coordinate of A
-            if point.y > b.y or point.y < a.y or point.x >= max(a.x, b.x):
-                continue
-
-            # If the x-coordinate of POI is smaller than the x-coordinate of both A and B,
-            # then the horizontal ray intersects with the edge
-            if point.x < min(a.x, b.x):
-                is_inside_polygon = not is_inside_polygon
-                continue
-
-            # Find slope of the edge
-            try:
-                slope_edge = (b.y - a.y) / (b.x - a.x)
-
-            # if the calculation produces a zero division error, then edge is vertical and its slope is set to infinity
-            except ZeroDivisionError:
-                slope_edge = _huge
-
-            # Find slope of the line segment between POI and A
-            try:
-                slope_point = (point.y - a.y) / (point.x - a.x)
-
-            # If the calculation produces a zero division error, then line between POI and A is vertical
-            # and its slope is set to infinity
-            except ZeroDivisionError:
-                slope_point = _huge
-
-            # The ray intersects with the edge if none of the conditions above have been fulfilled
-            # and the slope of the line between POI and A is greater than or equal to slope of the edge
-            if slope_point >= slope_edge:
+        # Only the edges of the slab containing POI can be crossed by the ray, if the polygon has a slab index
+        rows = self._contains_rows if self.slab_index is None else self.slab_index.contains_rows_at(y)
+        for a_x, a_y, b_y, inv_slope in rows:
+            # The x-coordinate where the edge crosses the ray is only computed for edges spanning the ray, which
+            # are never horizontal
+            if (a_y > y) != (b_y > y) and x < a_x + (y - a_y) * inv_slope:
                 is_inside_polygon = not is_inside_polygon
-                continue
-
         return is_inside_polygon
 
     def boundary(self, point):
         """The boundary() method takes a point-of-interest (POI), and checks if the POI lies on the polygon boundary.
-        Reference: Stackoverflow, answer by Jules on 29/11/2008, Determining if a point is between two other points
-        on a line segment: shorturl.at/drBJT
+        The POI is on an edge AB if it is inside the bounding box of the edge and the cross product of AB and AP is
+        (close to) zero, i.e. A, B and the POI are collinear. The method returns True at the first such edge.
         """
-
-        on_boundary = False
-        for edge in self.edges:
-            # name the 2 end points of the edge A and B
-            a, b = edge[0], edge[1]
-
-            # Calculate the distance between A and B, between A and POI, and between B and POI
-            # using the formula "distance = ((x1 - x2)**2 + (y1 - y2)**2) ** 1/2
-            distance_a_b = ((a.x - b.x) ** 2 + (a.y - b.y) ** 2) ** (1 / 2)
-            distance_a_point = ((a.x - point.x) ** 2 + (a.y - point.y) ** 2) ** (1 / 2)
-            distance_b_point = ((point.x - b.x) ** 2 + (point.y - b.y) ** 2) ** (1 / 2)
-            sum_point_dist = distance_a_point + distance_b_point
-
-            # Both numbers are rounded to 12 decimal places before comparison, since Python sometimes rounds
-            # square roots to different number of decimal places
-            distance_a_b = round(distance_a_b, 12)
-            sum_point_dist = round(sum_point_dist, 12)
-
-            # If the sum of the distance between A and POI, and between B and POI is equal to the
-            # distance between A and B, then the POI must lie on the edge, and the method returns True
-            if sum_point_dist == distance_a_b:
-                on_boundary = True
-        return on_boundary
+        # Only a few edges around the wedge containing POI can pass through it, if the polygon is convex, and only
+        # the edges of the slab containing POI, if the polygon has a slab index
+        if self.is_convex is True:
+            rows = self._convex_boundary_rows(point.x, point.y)
+        elif self.slab_index is None:
+            rows = self._boundary_rows
+        else:
+            rows = self.slab_index.boundary_rows_at(point.y)
+        for a_x, a_y, d_x, d_y, box_min_x, box_max_x, box_min_y, box_max_y, cross_tol in rows:
+            if box_min_x <= point.x <= box_max_x and box_min_y <= point.y <= box_max_y and \
+                    abs(d_x * (point.y - a_y) - d_y * (point.x - a_x)) <= cross_tol:
+                return True
+        return False
 
 
 def read_points_from_file(file_path, list_for_points):
     """ The read_points_from_file() function takes a csv file and inputs the points from the file
-    into a specified list as Point class instances.
+    into a specified list as Point class instances. Binary point files are read from their memory-mapped columns.
     """
+    if is_binary_points_file(file_path):
+        ids, xs, ys = open_binary_points(file_path)
+        for name, x, y in zip(ids.tolist(), xs.tolist(), ys.tolist()):
+            list_for_points.append(Point(name.decode("utf-8"), x, y))
+        return list_for_points
     with open(file_path, "r") as f:
         for line in (f.readlines()[1:]):
             items = line.split(",")
@@ -209,14 +597,719 @@ def read_points_from_file(file_path, list_for_points):
     return list_for_points
 
 
-def main(polygon_points_file, input_points_file, display_result=True, display_result_with_rays=False):
-    print("Read " + str(polygon_points_file))
-    # Read a list of polygon coordinates from "polygon.csv" file into polygon_points list
-    polygon_points_list = []
-    read_points_from_file(polygon_points_file, polygon_points_list)
+def read_rings_from_file(file_path):
+    """The read_rings_from_file() function takes a csv file of polygon vertices and returns a list of rings, each a
+    list of Point class instances. The vertices of a ring are listed in order; if the file has a "ring" column
+    (id,x,y,ring), the vertices are grouped into rings by it, in the order the rings first appear, and otherwise
+    all vertices form a single ring.
+    """
+    if is_binary_points_file(file_path):
+        return [read_points_from_file(file_path, [])]
+    rings = OrderedDict()
+    with open(file_path, "r") as f:
+        columns = [column.strip() for column in f.readline().split(",")]
+        ring_column = columns.index("ring") if "ring" in columns else None
+        for line in f:
+            if not line.strip():
+                continue
+            items = line.split(",")
+            ring = items[ring_column].strip() if ring_column is not None else None
+            rings.setdefault(ring, []).append(Point(str(items[0]), float(items[1]), float(items[2])))
+    return list(rings.values())
+
+
+def read_polygon_from_file(file_path, abs_tol=1e-9, rel_tol=1e-9):
+    """The read_polygon_from_file() function reads the rings of a polygon from a csv file (see
+    read_rings_from_file()) and returns the Polygon.
+    """
+    return Polygon.from_rings(read_rings_from_file(file_path), abs_tol, rel_tol)
 
-    # Make an instance of a Polygon from the points obtained in the previous step
-    polygon = Polygon(polygon_points_list)
+
+def read_points_in_chunks(file_path, chunk_size):
+    """The read_points_in_chunks() function reads a csv file of points chunk_size rows at a time, and yields every
+    chunk as an array of point ids (UTF-8 bytes) and arrays of x- and y-coordinates, so that only one chunk is in
+    memory at once. Binary point files are not parsed: their chunks are views of the memory-mapped columns.
+    """
+    if is_binary_points_file(file_path):
+        yield from read_binary_points_in_chunks(file_path, chunk_size)
+        return
+    # The file is read as bytes, so the ids are kept as they are written without decoding and encoding them
+    with open(file_path, "rb") as f:
+        # Skip the header line
+        f.readline()
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            ids, xs, ys = [], [], []
+            for line in lines:
+                if not line.strip():
+                    continue
+                items = line.split(b",")
+                ids.append(items[0])
+                xs.append(float(items[1]))
+                ys.append(float(items[2]))
+            yield np.array(ids, dtype=np.bytes_), np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64)
+
+
+# Category codes returned by classify_points(); CATEGORY_NAMES[code] gives the category as written to output.csv.
+# UNCLASSIFIED is the code of points in a PointSet that have not been classified yet
+OUTSIDE, BOUNDARY, INSIDE, UNCLASSIFIED = 0, 1, 2, 3
+CATEGORY_NAMES = ("outside", "boundary", "inside", "unclassified")
+
+
+class ClassificationCache:
+    """Definition of the ClassificationCache class, a bounded least-recently-used cache of category codes keyed on
+    the fingerprint of a polygon and the coordinates of a point. Editing a polygon changes its fingerprint, so
+    results for the old polygon are never returned for the new one; they are evicted as the cache fills up.
+    The hits and misses counters record how many lookups were answered from the cache. The cache is thread-safe.
+    """
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint, x, y):
+        """The get() method returns the cached category code of a point, or None if it is not in the cache."""
+        key = (fingerprint, x, y)
+        with self._lock:
+            code = self._entries.get(key)
+            if code is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return code
+
+    def put(self, fingerprint, x, y, code):
+        """The put() method stores the category code of a point, evicting the least recently used entry if the
+        cache is full.
+        """
+        with self._lock:
+            self._entries[(fingerprint, x, y)] = code
+            self._entries.move_to_end((fingerprint, x, y))
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def classify(self, polygon, point):
+        """The classify() method returns the category code of a point, from the cache or from Polygon.classify()."""
+        code = self.get(polygon.fingerprint, point.x, point.y)
+        if code is None:
+            code = polygon.classify(point)
+            self.put(polygon.fingerprint, point.x, point.y, code)
+        return code
+
+    def classify_points(self, polygon, xs, ys, classify=None):
+        """The classify_points() method returns the category codes of many points: cached points are answered from
+        the cache, and the others are classified in one batch by classify(xs, ys), which defaults to
+        classify_points() against the polygon.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        categories = np.zeros(xs.shape, dtype=np.uint8)
+        missing = []
+        for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist())):
+            code = self.get(polygon.fingerprint, x, y)
+            if code is None:
+                missing.append(i)
+            else:
+                categories[i] = code
+        if missing:
+            if classify is None:
+                computed = classify_points(polygon, xs[missing], ys[missing])
+            else:
+                computed = classify(xs[missing], ys[missing])
+            categories[missing] = computed
+            for x, y, code in zip(xs[missing].tolist(), ys[missing].tolist(), computed.tolist()):
+                self.put(polygon.fingerprint, x, y, code)
+        return categories
+
+    @property
+    def hit_rate(self):
+        """The hit_rate() method returns the fraction of lookups that were answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """The stats() method returns the size, capacity, hits, misses and hit rate of the cache as a dictionary."""
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hit_rate}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ClassificationStats:
+    """Definition of the ClassificationStats class, the opt-in profile of a classification run.
+    It records the wall time of every stage in seconds (summed over chunks, and over the worker processes when
+    there are several) and how many points went where: rejected by the MBR, answered by the grid, found on the
+    boundary, sent to the ray casting test and found inside, plus the number of edges examined by the exact tests.
+    Pass an instance as the stats argument of classify_points() (or of main()) to fill it.
+    """
+    COUNTERS = ("points", "mbr_rejected", "grid_answered", "exact_tested", "boundary", "sent_to_contains", "inside",
+                "edges_examined")
+
+    def __init__(self):
+        self.seconds = OrderedDict()
+        self.counts = OrderedDict((name, 0) for name in self.COUNTERS)
+
+    @contextmanager
+    def stage(self, name):
+        """The stage() method is a context manager that adds the wall time of its block to stage name."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def add(self, **counts):
+        """The add() method adds to the counters given as keyword arguments."""
+        for name, count in counts.items():
+            self.counts[name] += int(count)
+
+    def merge(self, other):
+        """The merge() method adds the times and counters of another ClassificationStats, or of its as_dict()."""
+        other = other.as_dict() if isinstance(other, ClassificationStats) else other
+        for name, seconds in other["seconds"].items():
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.add(**other["counts"])
+
+    @property
+    def edges_per_query(self):
+        """The edges_per_query() method returns the mean number of edges examined per exactly tested point."""
+        return self.counts["edges_examined"] / self.counts["exact_tested"] if self.counts["exact_tested"] else 0.0
+
+    def as_dict(self):
+        return {"seconds": dict(self.seconds), "counts": dict(self.counts), "edges_per_query": self.edges_per_query}
+
+    def write_json_line(self, file_path, **fields):
+        """The write_json_line() method appends the statistics as one JSON line to a file, with any extra fields
+        (e.g. the names of the input files) first.
+        """
+        record = dict(fields)
+        record.update(self.as_dict())
+        with open(file_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def _stage(stats, name):
+    """The _stage() function returns stats.stage(name), or a context manager that records nothing if stats is None."""
+    return stats.stage(name) if stats is not None else nullcontext()
+
+
+def _boundary_chunk(polygon, px, py, edge_ids=None):
+    """The _boundary_chunk() function takes points given as column vectors px and py, and returns a boolean array
+    which is True for the points on one of the polygon edges, or one of the edges in edge_ids.
+    """
+    ax, ay, bx, by = polygon.edge_ax, polygon.edge_ay, polygon.edge_bx, polygon.edge_by
+    tol, cross_tol = polygon.edge_tol, polygon.edge_cross_tol
+    if edge_ids is not None:
+        ax, ay, bx, by = ax[edge_ids], ay[edge_ids], bx[edge_ids], by[edge_ids]
+        tol, cross_tol = tol[edge_ids], cross_tol[edge_ids]
+
+    # The POI lies on an edge if it is inside the widened bounding box of the edge and collinear with A and B
+    in_box = (np.minimum(ax, bx) - tol <= px) & (px <= np.maximum(ax, bx) + tol) & \
+        (np.minimum(ay, by) - tol <= py) & (py <= np.maximum(ay, by) + tol)
+    collinear = np.abs((bx - ax) * (py - ay) - (by - ay) * (px - ax)) <= cross_tol
+    return (in_box & collinear).any(axis=1)
+
+
+def _contains_chunk(polygon, px, py, edge_ids=None):
+    """The _contains_chunk() function takes points given as column vectors px and py, and returns a boolean array
+    which is True for the points inside the polygon, counting crossings with all edges or the edges in edge_ids.
+    """
+    ax, ay, by = polygon.edge_ax, polygon.edge_ay, polygon.edge_by
+    inv_slope = polygon.edge_inv_slope
+    if edge_ids is not None:
+        ax, ay, by, inv_slope = ax[edge_ids], ay[edge_ids], by[edge_ids], inv_slope[edge_ids]
+
+    # Ray casting test: the horizontal ray from the POI crosses an edge if A and B lie on different sides of
+    # the ray and the crossing is to the right of the POI; an odd number of crossings means the POI is inside
+    spans = (ay > py) != (by > py)
+    x_cross = ax + (py - ay) * inv_slope
+    crossings = np.count_nonzero(spans & (px < x_cross), axis=1)
+    return crossings % 2 == 1
+
+
+def _convex_chunk(polygon, px, py):
+    """The _convex_chunk() function is the batch version of the wedge test of a convex polygon: it takes the x- and
+    y-coordinates of points as arrays, and returns a boolean array which is True for the points on the boundary, a
+    boolean array which is True for the points inside the polygon, and the number of fan edges examined. The wedge
+    of every point is found by a binary search over the fan vertices that runs for all points at once.
+    """
+    table = polygon._hull_table
+    centre_x, centre_y, start = polygon._hull_centre
+    angles = np.mod(np.arctan2(py - centre_y, px - centre_x) - start, 2 * np.pi)
+    wedge = np.searchsorted(polygon._hull_angles, angles, side="right") - 1
+    # Number of fan vertices compared with the points: one per step of the binary search, one for the edge
+    # closing the wedge and three boundary candidates
+    examined = (int(np.ceil(np.log2(len(table)))) + 4) * len(px)
+
+    # Inside: on the inner side of the edge closing the wedge
+    edge = table[wedge]
+    inside = (edge[:, 2] * (py - edge[:, 1]) - edge[:, 3] * (px - edge[:, 0])) > 0
+
+    # Boundary: the edge closing the wedge and the edges next to it, as in Polygon._convex_boundary_rows()
+    edges = table[(wedge[:, None] + np.array([-1, 0, 1])) % len(table)]
+    a_x, a_y, d_x, d_y = edges[..., 0], edges[..., 1], edges[..., 2], edges[..., 3]
+    column_x, column_y = px[:, None], py[:, None]
+    in_box = (edges[..., 4] <= column_x) & (column_x <= edges[..., 5]) & \
+        (edges[..., 6] <= column_y) & (column_y <= edges[..., 7])
+    collinear = np.abs(d_x * (column_y - a_y) - d_y * (column_x - a_x)) <= edges[..., 8]
+    return (in_box & collinear).any(axis=1), inside, examined
+
+
+def _convex_points(polygon, xs, ys, chunk_size=None):
+    """The _convex_points() function runs _convex_chunk() on the points in chunks of chunk_size points (by default
+    about 65 thousand), so that memory stays bounded, and returns the boundary and inside arrays of all points and
+    the number of fan edges examined.
+    """
+    on_boundary = np.zeros(xs.shape, dtype=bool)
+    inside = np.zeros(xs.shape, dtype=bool)
+    examined = 0
+    step = chunk_size if chunk_size is not None else 2 ** 16
+    for start in range(0, len(xs), step):
+        on_boundary[start:start + step], inside[start:start + step], chunk_examined = \
+            _convex_chunk(polygon, xs[start:start + step], ys[start:start + step])
+        examined += chunk_examined
+    return on_boundary, inside, examined
+
+
+def _edge_groups(polygon, index, ys, chunk_size=None):
+    """The _edge_groups() function splits the point indices in index into chunks, and yields every chunk with the
+    ids of the edges its points have to be tested against: all edges (None), or the edges of their slab if the
+    polygon has a slab index. By default the chunk size is chosen so that each (points, edges) array has about
+    65 thousand elements, which keeps the temporaries of the tests in the CPU caches.
+    """
+    if polygon.slab_index is None:
+        groups = [(index, None)]
+    else:
+        slabs = polygon.slab_index.slabs_of(ys[index])
+        order = np.argsort(slabs, kind="stable")
+        index, slabs = index[order], slabs[order]
+        starts = np.flatnonzero(np.diff(slabs, prepend=-2))
+        ends = np.append(starts[1:], len(slabs))
+        groups = [(index[i:j], polygon.slab_index.slab_edge_ids(slabs[i])) for i, j in zip(starts, ends)]
+
+    for group, edge_ids in groups:
+        n_edges = len(polygon.edge_ax) if edge_ids is None else len(edge_ids)
+        step = chunk_size if chunk_size is not None else max(1, 2 ** 16 // max(n_edges, 1))
+        for start in range(0, len(group), step):
+            yield group[start:start + step], edge_ids
+
+
+def boundary_points(polygon, xs, ys, chunk_size=None):
+    """The boundary_points() function is the batch version of Polygon.boundary(): it takes the x- and y-coordinates
+    of many points as arrays, and returns a boolean array which is True for the points on the polygon boundary.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if polygon.is_convex is True:
+        return _convex_points(polygon, xs, ys, chunk_size)[0]
+    on_boundary = np.zeros(xs.shape, dtype=bool)
+    for chunk, edge_ids in _edge_groups(polygon, np.arange(len(xs)), ys, chunk_size):
+        on_boundary[chunk] = _boundary_chunk(polygon, xs[chunk][:, None], ys[chunk][:, None], edge_ids)
+    return on_boundary
+
+
+def contains_points(polygon, xs, ys, chunk_size=None):
+    """The contains_points() function is the batch version of the ray casting test in Polygon.contains(): it takes
+    the x- and y-coordinates of many points as arrays, and returns a boolean array which is True for the points
+    inside the polygon.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if polygon.is_convex is True:
+        return _convex_points(polygon, xs, ys, chunk_size)[1]
+    inside = np.zeros(xs.shape, dtype=bool)
+    for chunk, edge_ids in _edge_groups(polygon, np.arange(len(xs)), ys, chunk_size):
+        inside[chunk] = _contains_chunk(polygon, xs[chunk][:, None], ys[chunk][:, None], edge_ids)
+    return inside
+
+
+def classify_points(polygon, xs, ys, chunk_size=None, stats=None):
+    """The classify_points() function takes a polygon and the x- and y-coordinates of many points as arrays, and
+    returns an array of category codes (OUTSIDE, BOUNDARY or INSIDE), one per point.
+    The MBR filter, the boundary test and the ray casting test are done as array operations over points x edges,
+    in chunks of chunk_size points so that memory stays bounded for large inputs.
+    If the polygon has a grid, points in cells that are entirely inside or outside are answered from the grid.
+    If the polygon has a slab index, the points are grouped by slab and each group is only tested against the
+    edges of its slab. Points of a convex polygon are classified by the wedge test instead, in O(log V) per point.
+    If a ClassificationStats is given as stats, the time of every stage and the counts of points are added to it;
+    without stats, nothing is timed or counted.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    categories = np.full(xs.shape, OUTSIDE, dtype=np.uint8)
+
+    # Points outside the MBR (widened by the boundary tolerance) are outside the polygon, so only the indices of
+    # points inside the MBR are kept
+    with _stage(stats, "mbr"):
+        tol = polygon.max_edge_tol
+        in_mbr = (polygon.min_x - tol <= xs) & (xs <= polygon.max_x + tol) & \
+            (polygon.min_y - tol <= ys) & (ys <= polygon.max_y + tol)
+        candidates = np.flatnonzero(in_mbr)
+    if stats is not None:
+        stats.add(points=len(xs), mbr_rejected=len(xs) - len(candidates))
+
+    # Points in grid cells that are entirely inside or outside get the category of their cell
+    if polygon.grid is not None:
+        with _stage(stats, "grid"):
+            states = polygon.grid.cell_states(xs[candidates], ys[candidates])
+            answered = states != GridIndex.CROSSED
+            categories[candidates[answered]] = states[answered]
+            candidates = candidates[~answered]
+        if stats is not None:
+            stats.add(grid_answered=np.count_nonzero(answered))
+    if stats is not None:
+        stats.add(exact_tested=len(candidates))
+
+    # A convex polygon is classified by the wedge test, without testing the points against every edge
+    if polygon.is_convex is True:
+        with _stage(stats, "wedge"):
+            on_boundary, inside, examined = _convex_points(polygon, xs[candidates], ys[candidates], chunk_size)
+            categories[candidates] = np.where(on_boundary, BOUNDARY, np.where(inside, INSIDE, OUTSIDE))
+        if stats is not None:
+            n_boundary = np.count_nonzero(on_boundary)
+            stats.add(boundary=n_boundary, sent_to_contains=len(candidates) - n_boundary,
+                      inside=np.count_nonzero(inside & ~on_boundary), edges_examined=examined)
+        return categories
+
+    for chunk, edge_ids in _edge_groups(polygon, candidates, ys, chunk_size):
+        # Column vectors of point coordinates, so that every operation broadcasts to (points, edges)
+        px, py = xs[chunk][:, None], ys[chunk][:, None]
+        if stats is None:
+            on_boundary = _boundary_chunk(polygon, px, py, edge_ids)
+            inside = _contains_chunk(polygon, px, py, edge_ids)
+            categories[chunk] = np.where(on_boundary, BOUNDARY, np.where(inside, INSIDE, OUTSIDE))
+            continue
+        with stats.stage("boundary"):
+            on_boundary = _boundary_chunk(polygon, px, py, edge_ids)
+        with stats.stage("contains"):
+            inside = _contains_chunk(polygon, px, py, edge_ids)
+        categories[chunk] = np.where(on_boundary, BOUNDARY, np.where(inside, INSIDE, OUTSIDE))
+        # Both tests examine every edge of the group for every point of the chunk
+        n_edges = len(polygon.edge_ax) if edge_ids is None else len(edge_ids)
+        n_boundary = np.count_nonzero(on_boundary)
+        stats.add(boundary=n_boundary, sent_to_contains=len(chunk) - n_boundary,
+                  inside=np.count_nonzero(inside & ~on_boundary), edges_examined=2 * len(chunk) * n_edges)
+    return categories
+
+
+# Polygon of a worker process, and whether its chunks are profiled, set once per worker by _init_worker()
+_worker_polygon = None
+_worker_profile = False
+
+
+def _init_worker(polygon, profile=False):
+    """The _init_worker() function runs once in every worker process and keeps the polygon it was given, so that
+    the polygon and its precomputed edge arrays are sent to each worker only once.
+    """
+    global _worker_polygon, _worker_profile
+    _worker_polygon = polygon
+    _worker_profile = profile
+
+
+def _classify_in_worker(chunk):
+    """The _classify_in_worker() function classifies a chunk (xs, ys) against the worker's polygon, and returns the
+    category codes, the grid hits and lookups made for the chunk, and its statistics (None if the chunks are not
+    profiled).
+    """
+    xs, ys = chunk
+    grid = _worker_polygon.grid
+    hits, lookups = (grid.hits, grid.lookups) if grid is not None else (0, 0)
+    stats = ClassificationStats() if _worker_profile is True else None
+    categories = classify_points(_worker_polygon, xs, ys, stats=stats)
+    if grid is not None:
+        hits, lookups = grid.hits - hits, grid.lookups - lookups
+    return categories, hits, lookups, stats.as_dict() if stats is not None else None
+
+
+def _classify_chunks(polygon, chunks, workers, stats=None):
+    """The _classify_chunks() function classifies an iterable of (ids, xs, ys) chunks and yields (ids, category
+    codes) for every chunk, in the order of the input. With more than one worker, the chunks are classified
+    concurrently by a process pool and the grid statistics of the workers are added to the polygon's grid, and
+    their classification statistics to stats.
+    """
+    if workers <= 1:
+        for ids, xs, ys in chunks:
+            yield ids, classify_points(polygon, xs, ys, stats=stats)
+        return
+    # Only the coordinates are sent to the workers; the ids of every chunk wait here for its categories
+    pending_ids = deque()
+
+    def coordinates():
+        for ids, xs, ys in chunks:
+            pending_ids.append(ids)
+            yield xs, ys
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(polygon, stats is not None)) as pool:
+        # imap() returns the results in the order of the chunks, so the output stays deterministic
+        for categories, hits, lookups, chunk_stats in pool.imap(_classify_in_worker, coordinates()):
+            if polygon.grid is not None:
+                polygon.grid.hits += hits
+                polygon.grid.lookups += lookups
+            if stats is not None:
+                stats.merge(chunk_stats)
+            yield pending_ids.popleft(), categories
+
+
+def classify_points_parallel(polygon, xs, ys, workers, chunk_size=100000, stats=None):
+    """The classify_points_parallel() function is the multi-core version of classify_points(): the points are split
+    into chunks of chunk_size points, which are classified by a pool of worker processes and merged back in order.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    chunks = ((None, xs[start:start + chunk_size], ys[start:start + chunk_size])
+              for start in range(0, len(xs), chunk_size))
+    results = [categories for ids, categories in _classify_chunks(polygon, chunks, workers, stats)]
+    return np.concatenate(results) if results else np.zeros(0, dtype=np.uint8)
+
+
+# Space-filling curves that spatial_order() can sort points along
+SPATIAL_CURVES = ("hilbert", "morton")
+
+
+def _grid_coordinates(xs, ys, bits):
+    """The _grid_coordinates() function maps points onto a 2**bits x 2**bits integer grid over their bounding box."""
+    cells = (1 << bits) - 1
+
+    def quantize(values):
+        low, high = (float(values.min()), float(values.max())) if len(values) else (0.0, 0.0)
+        scale = cells / (high - low) if high > low else 0.0
+        return np.clip(((values - low) * scale).astype(np.int64), 0, cells)
+
+    return quantize(xs), quantize(ys)
+
+
+def _spread_bits(values):
+    """The _spread_bits() function moves bit i of every value (of up to 32 bits) to bit 2 * i."""
+    values = values.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def morton_index(columns, rows):
+    """The morton_index() function returns the position of every grid cell (column, row) along the Z-order curve,
+    which interleaves the bits of the column and the row.
+    """
+    return _spread_bits(columns) | (_spread_bits(rows) << np.uint64(1))
+
+
+def hilbert_index(columns, rows, bits):
+    """The hilbert_index() function returns the position of every cell (column, row) of a 2**bits x 2**bits grid
+    along the Hilbert curve, which unlike the Z-order curve never jumps between distant cells.
+    Reference: Wikipedia, Hilbert curve: https://en.wikipedia.org/wiki/Hilbert_curve.
+    """
+    n = 1 << bits
+    x, y = columns.astype(np.int64), rows.astype(np.int64)
+    index = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        index += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotate the quadrant, so that the curve inside it runs in the standard orientation
+        flip = ~ry & rx
+        x = np.where(flip, n - 1 - x, x)
+        y = np.where(flip, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+    return index
+
+
+def spatial_order(xs, ys, curve="hilbert", bits=16):
+    """The spatial_order() function returns the permutation that sorts points along a space-filling curve (one of
+    SPATIAL_CURVES) over a 2**bits x 2**bits grid on their bounding box, so that points that follow each other in
+    the new order are also close to each other in the plane.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    columns, rows = _grid_coordinates(xs, ys, bits)
+    if curve == "hilbert":
+        index = hilbert_index(columns, rows, bits)
+    elif curve == "morton":
+        index = morton_index(columns, rows)
+    else:
+        raise ValueError("Unknown space-filling curve: " + str(curve))
+    return np.argsort(index, kind="stable")
+
+
+class PointSet:
+    """Definition of the PointSet class, a compact struct-of-arrays container for many points.
+    PointSet object class has 3 required attributes: array of point ids (fixed-width bytes), and arrays of x- and
+    y-coordinates (float64). Every point also has a category code (uint8), UNCLASSIFIED until classify() is called.
+    Pipeline stages work on index arrays into the columns instead of copying points into lists.
+    """
+    def __init__(self, ids, xs, ys):
+        self.ids = np.asarray(ids, dtype=np.bytes_)
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.categories = np.full(len(self.xs), UNCLASSIFIED, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.xs)
+
+    @classmethod
+    def from_file(cls, file_path, chunk_size=1000000):
+        """The from_file() method reads a csv file of points chunk_size rows at a time into a PointSet. The columns
+        of a binary point file are memory-mapped instead of read.
+        """
+        if is_binary_points_file(file_path):
+            return cls(*open_binary_points(file_path))
+        ids, xs, ys = [], [], []
+        for chunk_ids, chunk_xs, chunk_ys in read_points_in_chunks(file_path, chunk_size):
+            ids.append(chunk_ids)
+            xs.append(chunk_xs)
+            ys.append(chunk_ys)
+        if not xs:
+            return cls(np.zeros(0, dtype="S1"), np.zeros(0), np.zeros(0))
+        return cls(np.concatenate(ids), np.concatenate(xs), np.concatenate(ys))
+
+    def names(self, index=None):
+        """The names() method returns the ids of all points, or of the points in index, as a list of strings."""
+        ids = self.ids if index is None else self.ids[index]
+        return [name.decode("utf-8") for name in ids.tolist()]
+
+    def category_names(self, index=None):
+        """The category_names() method returns the category of all points, or of the points in index, as strings."""
+        categories = self.categories if index is None else self.categories[index]
+        return [CATEGORY_NAMES[code] for code in categories.tolist()]
+
+    def classify(self, polygon, workers=1, stats=None, spatial_sort=None):
+        """The classify() method sets the category code of every point against the polygon, and returns them.
+        If a ClassificationStats is given as stats, the statistics of the classification are added to it.
+        With spatial_sort (one of SPATIAL_CURVES), the points are classified in the order of that space-filling
+        curve, so that consecutive points share grid cells, slabs and chunks; the categories are stored back in
+        the original order of the points.
+        """
+        xs, ys = self.xs, self.ys
+        order = None
+        if spatial_sort is not None:
+            with _stage(stats, "spatial_sort"):
+                order = spatial_order(xs, ys, spatial_sort)
+                xs, ys = xs[order], ys[order]
+        if workers > 1:
+            categories = classify_points_parallel(polygon, xs, ys, workers, stats=stats)
+        else:
+            categories = classify_points(polygon, xs, ys, stats=stats)
+        if order is None:
+            self.categories[:] = categories
+        else:
+            self.categories[order] = categories
+        return self.categories
+
+    def write_csv(self, file_path, block_size=100000):
+        """The write_csv() method writes the id and category of every point to an id,category csv file, joining
+        block_size rows at a time.
+        """
+        self.write(file_path, "csv", block_size)
+
+    def write(self, file_path, output_format="csv", block_size=100000):
+        """The write() method writes the results to a file in one of the OUTPUT_FORMATS (see open_output())."""
+        with open_output(file_path, output_format, block_size) as output:
+            output.write(self.ids, self.categories)
+
+
+# Formats of the results file: id,category csv, binary ids and categories, or binary categories only
+OUTPUT_FORMATS = ("csv", "binary", "codes")
+# Category names as bytes, indexed by category code
+_CATEGORY_BYTES = np.array([name.encode("utf-8") for name in CATEGORY_NAMES], dtype=object)
+
+
+class CsvOutput:
+    """Definition of the CsvOutput class, which writes classification results to an id,category csv file chunk by
+    chunk. Rows are joined as bytes block_size at a time, without decoding the ids, and written through a large
+    buffer.
+    """
+    def __init__(self, file_path, block_size=100000):
+        self.block_size = block_size
+        self._file = open(file_path, "wb", buffering=1 << 20)
+        self._file.write(b"id,category")
+
+    def write(self, ids, categories):
+        """The write() method appends the rows of a chunk of points, given as an array of ids (bytes) and an
+        array of category codes.
+        """
+        for start in range(0, len(categories), self.block_size):
+            names = np.asarray(ids[start:start + self.block_size], dtype=np.bytes_).tolist()
+            if names:
+                category_names = _CATEGORY_BYTES[categories[start:start + self.block_size]].tolist()
+                self._file.write(b"\n" + b"\n".join(map(b",".join, zip(names, category_names))))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_output(file_path, output_format="csv", block_size=100000):
+    """The open_output() function opens a results file for writing chunk by chunk, and returns an object with
+    write(ids, categories) and close() methods (which can also be used in a with statement). output_format is one of
+    OUTPUT_FORMATS:
+    - csv: an id,category csv file, as in output.csv;
+    - binary: a binary results file with the category code and the id of every point (see binary_points);
+    - codes: a binary results file with only the category codes, in the order of the input points.
+    """
+    if output_format == "csv":
+        return CsvOutput(file_path, block_size)
+    if output_format in ("binary", "codes"):
+        return BinaryCategoriesWriter(file_path, with_ids=output_format == "binary")
+    raise ValueError("Unknown output format: " + str(output_format))
+
+
+def classify_file_in_chunks(polygon, input_points_file, output_points_file, chunk_size=100000, workers=1,
+                            stats=None, output_format="csv"):
+    """The classify_file_in_chunks() function reads the input points chunk_size rows at a time, classifies every
+    chunk and appends its results to the output file before the next chunk is read, so that memory use does not
+    depend on the number of rows. With more than one worker, chunks are classified concurrently and written in
+    the order they were read. The function returns the number of points classified.
+    If a ClassificationStats is given as stats, the classification statistics and the time spent writing are
+    added to it. The results are written in output_format, one of OUTPUT_FORMATS.
+    """
+    n_points = 0
+    with open_output(output_points_file, output_format) as output:
+        chunks = read_points_in_chunks(input_points_file, chunk_size)
+        for ids, categories in _classify_chunks(polygon, chunks, workers, stats):
+            with _stage(stats, "write"):
+                output.write(ids, categories)
+            n_points += len(categories)
+    return n_points
+
+
+def main(polygon_points_file, input_points_file, display_result=True, display_result_with_rays=False,
+         slab_index=False, grid_resolution=None, chunk_size=None, workers=1, plot_file=None, max_plot_points=None,
+         polygon_cache=False, profile=False, profile_file=None, output_file="output.csv", output_format="csv",
+         spatial_sort=None):
+    # With profile or profile_file, the time of every stage and the counts of points are recorded, returned as a
+    # ClassificationStats, and appended to profile_file as a JSON line; otherwise nothing is recorded
+    stats = ClassificationStats() if profile is True or profile_file is not None else None
+    print("Read " + str(polygon_points_file))
+    with _stage(stats, "read_polygon"):
+        if polygon_cache is True:
+            # Load the prepared polygon (with its slab index and grid) from the cache file next to the polygon
+            # file, and only prepare it again if the polygon file has changed since
+            from polygon_cache import prepare_polygon
+            polygon = prepare_polygon(polygon_points_file, slab_index, grid_resolution)
+        else:
+            # Read the rings of polygon coordinates from "polygon.csv" file, and make an instance of a Polygon
+            polygon = read_polygon_from_file(polygon_points_file)
+            # Build the slab index once, so that every input point is only tested against the edges of its slab
+            if slab_index is True:
+                polygon.build_slab_index()
+            # Build a grid of pre-classified cells, so that only points in cells crossed by an edge need the exact
+            # tests
+            if grid_resolution is not None:
+                polygon.build_grid(grid_resolution)
 
     # Find coordinates for MBR
     polygon_xs = polygon.x_vertices()
@@ -230,70 +1323,72 @@ def main(polygon_points_file, input_points_file, display_result=True, display_re
     mbr_x = [min_x, min_x, max_x, max_x, min_x]
     mbr_y = [min_y, max_y, max_y, min_y, min_y]
 
-    # Read a list of points for testing from "input.csv" file into input_points list
-    print("Read " + str(input_points_file))
-    input_points_list = []
-    read_points_from_file(input_points_file, input_points_list)
-
-    # Find the maximum x-coordinate from all the input points for drawing the rays
-    x_inputs = []
-    for point in input_points_list:
-        x_inputs.append(point.x)
-    max_x_input = max(x_inputs)
+    # In streaming mode the input is read, classified and written chunk_size points at a time, and no points are
+    # kept in memory, so the result cannot be plotted
+    if chunk_size is not None:
+        print("Categorize " + str(input_points_file) + " and write " + str(output_file) + " in chunks of "
+              + str(chunk_size) + " points")
+        with _stage(stats, "stream"):
+            classify_file_in_chunks(polygon, input_points_file, output_file, chunk_size, workers, stats,
+                                    output_format)
+        if display_result is True or plot_file is not None:
+            print("Plotting is not available in streaming mode")
+        if spatial_sort is not None:
+            print("Spatial sorting is not available in streaming mode")
+        return _finish_profile(stats, profile, profile_file, polygon_points_file, input_points_file, workers)
 
-    # Make a dictionary of points for testing, where point name/id is key, and point coordinates and location are values
-    points_dictionary = {}
-    for point in input_points_list:
-        points_dictionary.update({point.name: [point.x, point.y, "unclassified"]})
+    # Read the points for testing from "input.csv" file into a PointSet of id, x and y columns
+    print("Read " + str(input_points_file))
+    with _stage(stats, "read_points"):
+        input_points = PointSet.from_file(input_points_file)
 
     print("Categorize points")
-    # Find which input points are inside MBR and append them to a list of points for further testing
-    points_inside_mbr = []
-    for point in input_points_list:
-        if polygon.mbr_contains(point, min_x, max_x, min_y, max_y) is True:
-            points_inside_mbr.append(point)
-        else:
-            points_dictionary[point.name][2] = "outside"
-
-    # Find which points are on the polygon boundary and append the other points to a list of points for further testing
-    to_be_classified = []
-    for point in points_inside_mbr:
-        if polygon.boundary(point) is True:
-            points_dictionary[point.name][2] = "boundary"
-        else:
-            to_be_classified.append(point)
+    # Classify all input points in one batch: MBR filter, boundary test and ray casting are done as array operations
+    input_points.classify(polygon, workers, stats, spatial_sort)
+    if polygon.grid is not None:
+        print("Grid hit rate: " + str(round(100 * polygon.grid.hit_rate, 1)) + "% of points inside the MBR")
 
-    # Classify points that are inside the MBR and not on the boundary
-    for point in to_be_classified:
-        if polygon.contains(point) is True:
-            points_dictionary[point.name][2] = "inside"
-        else:
-            points_dictionary[point.name][2] = "outside"
-
-    # For each input point, write point name with the result of its classification into a file "output.csv"
-    print("Write output.csv")
-    output_file = open("output.csv", "w+")
-    output_file.write("id,category")
+    # For each input point, write point name with the result of its classification into output_file (by default
+    # "output.csv"), in output_format
+    print("Write " + str(output_file))
+    with _stage(stats, "write"):
+        input_points.write(output_file, output_format)
 
-    # For each input point in the dictionary, write point name/id with the result of its classification into output file
-    for key, values in points_dictionary.items():
-        output_file.write("\n")
-        output_file.write(key + "," + values[2])
-    output_file.close()
-
-    # Plot the results of classification alongside the original polygon
-    if display_result is True:
+    # Plot the results of classification alongside the original polygon, in a window and/or into plot_file
+    if display_result is True or plot_file is not None:
         print("Plot polygon and points")
-        plotter = Plotter()
-        plotter.add_polygon(polygon.x_vertices(), polygon.y_vertices())
+        # matplotlib is only imported when the result is plotted
+        from plotter import Plotter
+        plotter = Plotter(interactive=display_result)
+        if len(polygon.ring_sizes) > 1:
+            plotter.add_polygon_rings([[point.x for point in ring] for ring in polygon.rings],
+                                      [[point.y for point in ring] for ring in polygon.rings])
+        else:
+            plotter.add_polygon(polygon.x_vertices(), polygon.y_vertices())
         plotter.add_mbr(mbr_x, mbr_y)
-        for key, values in points_dictionary.items():
-            plotter.add_point(values[0], values[1], values[2])
+        # Every category is drawn as one collection; above max_plot_points a random sample of points is drawn
+        categories = np.array(CATEGORY_NAMES)[input_points.categories]
+        plotter.add_points(input_points.xs, input_points.ys, categories, max_points=max_plot_points)
         if display_result_with_rays is True:
-            for key, values in points_dictionary.items():
-                plotter.add_ray(values[0], values[1], max_x_input)
-        plotter.show()
-    return None
+            # The rays are drawn to the right of the maximum x-coordinate of all the input points
+            plotter.add_rays(input_points.xs, input_points.ys, input_points.xs.max())
+        if plot_file is not None:
+            print("Write " + str(plot_file))
+            with _stage(stats, "plot"):
+                plotter.save(plot_file)
+        if display_result is True:
+            plotter.show()
+    return _finish_profile(stats, profile, profile_file, polygon_points_file, input_points_file, workers)
+
+
+def _finish_profile(stats, profile, profile_file, polygon_points_file, input_points_file, workers):
+    """The _finish_profile() function appends the statistics of a run of main() to profile_file, if there is one,
+    and returns them if profiling was asked for (or None otherwise).
+    """
+    if profile_file is not None:
+        stats.write_json_line(profile_file, polygon_file=str(polygon_points_file), input_file=str(input_points_file),
+                              workers=workers)
+    return stats
 
 
 # If the whole file is executed:
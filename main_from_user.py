@@ -1,46 +1,5 @@
-# Import modules for the Plotter class
-from collections import OrderedDict
-import matplotlib
-import matplotlib.pyplot as plt
-# Import sys module for the RCA algorithm in the Polygon class
-import sys
-
-matplotlib.use("TkAgg")
-
-
-class Plotter:
-    """Definition of the Plotter class, used to plot the polygon, the MBR and the points."""
-    def __init__(self):
-        plt.figure()
-
-    def add_polygon(self, xs, ys):
-        plt.fill(xs, ys, "lightgray", label="Polygon", lw=2, zorder=0)
-
-    # This method plots the MBR
-    def add_mbr(self, xs, ys):
-        plt.plot(xs, ys, "deepskyblue", label="MBR", linestyle="--", lw=1.4)
-
-    def add_point(self, x, y, kind=None):
-        if kind == "outside":
-            plt.plot(x, y, "ro", label="Outside")
-        elif kind == "boundary":
-            plt.plot(x, y, "bo", label="Boundary")
-        elif kind == "inside":
-            plt.plot(x, y, "go", label="Inside")
-        else:
-            plt.plot(x, y, "ko", label="Unclassified")
-
-    def add_ray(self, x, y, max_x):
-        """The add_ray() method plots a horizontal ray from the specified point."""
-        xs = [x, max_x + 1]
-        ys = [y, y]
-        plt.plot(xs, ys, label="Ray", linewidth=0.4,  color="black")
-
-    def show(self):
-        handles, labels = plt.gca().get_legend_handles_labels()
-        by_label = OrderedDict(zip(labels, handles))
-        plt.legend(by_label.values(), by_label.keys())
-        plt.show()
+# Import the cache of classification results
+from main_from_file import ClassificationCache, polygon_fingerprint, CATEGORY_NAMES
 
 
 class Point:
@@ -102,64 +61,24 @@ class Polygon:
     def contains(self, point):
         """The polygon_contains() method takes a point-of-interest (POI), implements the RCA and returns True if
         the POI is inside the polygon.
+        An edge is crossed by the horizontal ray from the POI if exactly one of its end points lies above the ray
+        (half-open rule: an end point at the height of the ray counts as below it) and the edge crosses the ray to
+        the right of the POI. A vertex at the height of the ray is therefore counted exactly once, without moving
+        the POI, and the method does not change the point it is given.
         References:
         - Lemons, Phillip, Ray casting algorithm: http://philliplemons.com/posts/ray-casting-algorithm;
         - Rosettacode.org, Ray casting algorithm, Python: https://rosettacode.org/wiki/Ray-casting_algorithm.
         """
-
-        # _huge acts as infinity if there is division by 0
-        _huge = sys.float_info.max
-        # _eps is used in cases where POI has the same y-coordinate as A or B
-        _eps = 0.00001
-
         is_inside_polygon = False
         # Start on the outside of the polygon, and consider one polygon edge at a time
         for edge in self.edges:
             # name the 2 end points of the edge A and B
             a, b = edge[0], edge[1]
-            # make sure A is lower than B
-            if a.y > b.y:
-                a, b = b, a
-
-            # Make sure POI does not have the same y-coordinate as one of the edge points
-            if point.y == a.y or point.y == b.y:
-                # If POI has the same y-coordinate as A or B, increase the y-coordinate of POI by a small number
-                point.y += _eps
-
-            # If the x or y-coordinate of POI is greater or smaller than ???
-            # then the horizontal ray does not intersect with the edge
-            if point.y > b.y or point.y < a.y or point.x >= max(a.x, b.x):
-                continue
-
-            # If the x-coordinate of POI is smaller than the x-coordinate of both A and B,
-            # then the horizontal ray intersects with the edge
-            if point.x < min(a.x, b.x):
+            # The x-coordinate where the edge crosses the ray is only computed for edges spanning the ray, which
+            # are never horizontal
+            if (a.y > point.y) != (b.y > point.y) and \
+                    point.x < a.x + (point.y - a.y) * (b.x - a.x) / (b.y - a.y):
                 is_inside_polygon = not is_inside_polygon
-                continue
-
-            # Find slope of the edge
-            try:
-                slope_edge = (b.y - a.y) / (b.x - a.x)
-
-            # if the calculation produces a zero division error, then edge is vertical and its slope is set to infinity
-            except ZeroDivisionError:
-                slope_edge = _huge
-
-            # Find slope of the line segment between POI and A
-            try:
-                slope_point = (point.y - a.y) / (point.x - a.x)
-
-            # If the calculation produces a zero division error, then line between POI and A is vertical
-            # and its slope is set to infinity
-            except ZeroDivisionError:
-                slope_point = _huge
-
-            # The ray intersects with the edge if none of the conditions above have been fulfilled
-            # and the slope of the line between POI and A is greater than or equal to slope of the edge
-            if slope_point >= slope_edge:
-                is_inside_polygon = not is_inside_polygon
-                continue
-
         return is_inside_polygon
 
     def boundary(self, point):
@@ -204,21 +123,19 @@ def read_points_from_file(file_path, list_for_points):
     return list_for_points
 
 
-def main(polygon_points_file):
+def main(polygon_points_file, cache_size=1000):
 
     def check_point(the_polygon, point):
         """ The check_point() function takes a polygon and a point, and checks the location of the point, using the
         Polygon class methods defined above. The function returns the result as a string.
         """
+        # The MBR and boundary tests are done once each; contains() is only needed inside the MBR off the boundary
         check_result = "outside"
-        if the_polygon.mbr_contains(point, min_x, max_x, min_y, max_y) is False:
-            check_result = "outside"
-        elif the_polygon.mbr_contains(point, min_x, max_x, min_y, max_y) is True:
+        if the_polygon.mbr_contains(point, min_x, max_x, min_y, max_y) is True:
             if the_polygon.boundary(point) is True:
                 check_result = "boundary"
-            elif the_polygon.boundary(point) is False:
-                if the_polygon.contains(point) is True:
-                    check_result = "inside"
+            elif the_polygon.contains(point) is True:
+                check_result = "inside"
         return check_result
 
     print("--Read " + str(polygon_points_file))
@@ -229,6 +146,10 @@ def main(polygon_points_file):
     # Make an instance of a Polygon from the points obtained in the previous step
     polygon = Polygon(polygon_points_list)
 
+    # Results of repeated points are taken from a cache, keyed on the hash of the polygon vertices
+    cache = ClassificationCache(cache_size)
+    fingerprint = polygon_fingerprint(polygon_points_list)
+
     # Find coordinates for MBR
     polygon_xs = polygon.x_vertices()
     polygon_ys = polygon.y_vertices()
@@ -264,13 +185,20 @@ def main(polygon_points_file):
         input_point = Point(x, y)
 
         print("--Categorize point")
-        # Check the location of the point and record it in result
-        result = check_point(polygon, input_point)
+        # Check the location of the point and record it in result, unless the point has been checked before
+        code = cache.get(fingerprint, x, y)
+        if code is None:
+            result = check_point(polygon, input_point)
+            cache.put(fingerprint, x, y, CATEGORY_NAMES.index(result))
+        else:
+            result = CATEGORY_NAMES[code]
         print("Your point is on the " + result + " of the polygon.")
 
         # Plot the results of classification alongside the original polygon
         print("--Plot polygon and points")
         print("IMPORTANT: Please close the plot window to continue")
+        # matplotlib is only imported when a point is plotted
+        from plotter import Plotter
         plotter = Plotter()
         plotter.add_polygon(polygon.x_vertices(), polygon.y_vertices())
         plotter.add_mbr(mbr_x, mbr_y)
@@ -286,6 +214,8 @@ def main(polygon_points_file):
             user_decision = input("Your answer is not recognised. Would you like to check location of a point? "
                                   "Please enter yes or no:  ")
 
+    print("--Cache: " + str(cache.hits) + " hits, " + str(cache.misses) + " misses")
+
 
 # If the whole file is executed:
 if __name__ == "__main__":
@@ -1,21 +1,187 @@
-"""This code allows generation of more input points for testing, located at regular intervals"""
-points_list=[]
-xlist=[]
-ylist=[]
-
-for i in range(31):
-    xlist = xlist + [-1 + i/5]
-for i in range(46):
-    ylist = ylist + [-1 + i/5]
-
-for i in range(len(xlist)):
-    for j in range(len(ylist)):
-        points_list=points_list+[(xlist[i], ylist[j])]
-
-more_input = open('more_input.csv', 'w+')
-
-more_input.write('id,x,y')
-for i, point in enumerate(points_list):
-    more_input.write('\n')
-    more_input.write(str(i) + ',' + str(point[0]) + ',' + str(point[1]))
-more_input.close()
+"""Generation of synthetic input points around a polygon, for testing and load testing at any size.
+
+The points are generated and written chunk_size points at a time, so memory use does not depend on the number of
+points. The same seed, distribution and chunk size always give the same points. The points have the ids 0, 1, 2, ...
+and are written to an id,x,y csv file or to a binary point file (see binary_points). The expected category of
+every point can be written to a results file of the same formats as main_from_file.main writes, so that the
+results of a run can be compared with it. The expected categories do not come from the classifier they check:
+points generated on an edge are on the boundary by construction, and every other point is classified by a
+simple reference kernel (reference_categories()).
+
+Distributions:
+- grid: a regular grid over the MBR of the polygon, widened by 10%, filled row by row;
+- uniform: uniformly spread over the MBR of the polygon, widened by 10%;
+- clustered: gaussian clusters around random centres in the MBR;
+- near_boundary: points on the edges of the polygon (with a probability proportional to the edge length), moved
+  off the edge by a tiny gaussian offset; a tenth of the points stay on the edge.
+
+Example: python more_input_gen.py polygon.csv big_input.pts --points 100000000 --distribution near_boundary
+         --format binary --expected big_expected.bin --expected-format binary --seed 7
+"""
+# Import argparse for the command line options
+import argparse
+# Import numpy for generating the points chunk by chunk
+import numpy as np
+# Import the binary point format for writing large inputs
+from binary_points import BinaryPointsWriter
+# Import the geometry core from main_from_file for the polygon and the expected categories
+from main_from_file import read_polygon_from_file, open_output, OUTPUT_FORMATS, OUTSIDE, BOUNDARY, INSIDE
+
+DISTRIBUTIONS = ("grid", "uniform", "clustered", "near_boundary")
+POINT_FORMATS = ("csv", "binary")
+
+
+def generate_points(polygon, n_points, distribution="uniform", seed=0, chunk_size=1000000, n_clusters=20,
+                    cluster_spread=0.05, boundary_offset=1e-4):
+    """The generate_points() function yields the x- and y-coordinates of n_points synthetic points around a
+    polygon, chunk_size points at a time, as tuples of arrays (xs, ys, on_edge), where on_edge is True for the
+    points that were placed on an edge of the polygon. cluster_spread is the standard deviation of the
+    clusters and boundary_offset the one of the offsets from the edges, both relative to the size of the MBR.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError("Unknown point distribution: " + str(distribution))
+    rng = np.random.default_rng(seed)
+    width, height = polygon.max_x - polygon.min_x, polygon.max_y - polygon.min_y
+    min_x, max_x = polygon.min_x - 0.1 * width, polygon.max_x + 0.1 * width
+    min_y, max_y = polygon.min_y - 0.1 * height, polygon.max_y + 0.1 * height
+    # Everything chosen once for all chunks is drawn before the first chunk
+    if distribution == "grid":
+        columns = max(int(np.ceil(np.sqrt(n_points * (max_x - min_x) / max(max_y - min_y, 1e-300)))), 1)
+        rows = max(-(-n_points // columns), 1)
+        step_x, step_y = (max_x - min_x) / columns, (max_y - min_y) / rows
+    elif distribution == "clustered":
+        centres_x = rng.uniform(polygon.min_x, polygon.max_x, n_clusters)
+        centres_y = rng.uniform(polygon.min_y, polygon.max_y, n_clusters)
+    elif distribution == "near_boundary":
+        cumulative_length = np.cumsum(polygon.edge_length)
+        offset = boundary_offset * max(width, height)
+
+    for start in range(0, n_points, chunk_size):
+        count = min(chunk_size, n_points - start)
+        on_edge = np.zeros(count, dtype=bool)
+        if distribution == "grid":
+            index = np.arange(start, start + count)
+            xs = min_x + (index % columns + 0.5) * step_x
+            ys = min_y + (index // columns + 0.5) * step_y
+        elif distribution == "uniform":
+            xs = rng.uniform(min_x, max_x, count)
+            ys = rng.uniform(min_y, max_y, count)
+        elif distribution == "clustered":
+            centres = rng.integers(0, n_clusters, count)
+            xs = centres_x[centres] + rng.normal(0, cluster_spread * width, count)
+            ys = centres_y[centres] + rng.normal(0, cluster_spread * height, count)
+        else:
+            edges = np.searchsorted(cumulative_length, rng.uniform(0, cumulative_length[-1], count), side="right")
+            edges = np.minimum(edges, len(cumulative_length) - 1)
+            t = rng.uniform(0, 1, count)
+            xs = polygon.edge_ax[edges] + t * (polygon.edge_bx[edges] - polygon.edge_ax[edges])
+            ys = polygon.edge_ay[edges] + t * (polygon.edge_by[edges] - polygon.edge_ay[edges])
+            on_edge = rng.uniform(0, 1, count) < 0.1
+            moved = np.where(on_edge, 0.0, offset)
+            xs = xs + rng.normal(0, 1, count) * moved
+            ys = ys + rng.normal(0, 1, count) * moved
+        yield xs, ys, on_edge
+
+
+def reference_categories(polygon, xs, ys):
+    """The reference_categories() function is a plain reference kernel for the expected categories, written apart
+    from main_from_file.classify_points() so that it can check it. A point is on the boundary if its distance to
+    the nearest point of an edge is at most the tolerance of that edge, as defined in Polygon; otherwise it is
+    inside if it is on the left of an odd number of edges going up through its height or on the right of an odd
+    number of edges going down through it (crossing number of the ray to the right of the point, even-odd rule).
+    """
+    categories = np.full(len(xs), OUTSIDE, dtype=np.uint8)
+    ax, ay, bx, by = polygon.edge_ax, polygon.edge_ay, polygon.edge_bx, polygon.edge_by
+    dx, dy = bx - ax, by - ay
+    squared_length = dx * dx + dy * dy
+    step = max(1, 2 ** 20 // max(len(ax), 1))
+    for start in range(0, len(xs), step):
+        px, py = xs[start:start + step, None], ys[start:start + step, None]
+        # Distance to the nearest point of every edge
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(squared_length > 0, ((px - ax) * dx + (py - ay) * dy) / squared_length, 0.0), 0, 1)
+        on_boundary = (np.hypot(px - (ax + t * dx), py - (ay + t * dy)) <= polygon.edge_tol).any(axis=1)
+        # Side of the point relative to every edge: positive on the left
+        side = dx * (py - ay) - dy * (px - ax)
+        crossings = ((ay <= py) & (py < by) & (side > 0)) | ((by <= py) & (py < ay) & (side < 0))
+        inside = np.count_nonzero(crossings, axis=1) % 2 == 1
+        categories[start:start + step] = np.where(on_boundary, BOUNDARY, np.where(inside, INSIDE, OUTSIDE))
+    return categories
+
+
+class CsvPointsWriter:
+    """Definition of the CsvPointsWriter class, which writes points to an id,x,y csv file chunk by chunk. The
+    coordinates are written with repr(), so they are read back exactly.
+    """
+    def __init__(self, file_path):
+        self._file = open(file_path, "w", buffering=1 << 20)
+        self._file.write("id,x,y")
+
+    def write(self, ids, xs, ys):
+        """The write() method appends the rows of a chunk of points, given as an array of ids (bytes) and arrays
+        of x- and y-coordinates.
+        """
+        if len(xs):
+            names = np.char.decode(np.asarray(ids, dtype=np.bytes_), "ascii").tolist()
+            self._file.write("\n" + "\n".join(map(",".join, zip(names, map(repr, xs.tolist()),
+                                                                 map(repr, ys.tolist())))))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(polygon_file, output_file, n_points=1426, distribution="grid", seed=0, point_format="csv",
+         expected_file=None, expected_format="csv", chunk_size=1000000):
+    print("Read " + str(polygon_file))
+    polygon = read_polygon_from_file(polygon_file)
+
+    print("Write " + str(n_points) + " " + distribution + " points to " + str(output_file))
+    if point_format == "binary":
+        points = BinaryPointsWriter(output_file, n_points, len(str(max(n_points - 1, 0))))
+    else:
+        points = CsvPointsWriter(output_file)
+    expected = open_output(expected_file, expected_format) if expected_file is not None else None
+    counts = np.zeros(3, dtype=np.int64)
+    try:
+        start = 0
+        for xs, ys, on_edge in generate_points(polygon, n_points, distribution, seed, chunk_size):
+            ids = np.arange(start, start + len(xs)).astype(np.bytes_)
+            points.write(ids, xs, ys)
+            if expected is not None:
+                categories = np.full(len(xs), BOUNDARY, dtype=np.uint8)
+                categories[~on_edge] = reference_categories(polygon, xs[~on_edge], ys[~on_edge])
+                expected.write(ids, categories)
+                counts += np.bincount(categories, minlength=3)[:3]
+            start += len(xs)
+    finally:
+        points.close()
+        if expected is not None:
+            expected.close()
+    if expected is not None:
+        print("Wrote the expected categories to " + str(expected_file) + ": " + str(counts[2]) + " inside, " +
+              str(counts[1]) + " boundary, " + str(counts[0]) + " outside")
+    return None
+
+
+# If the whole file is executed, generate the points given by the command line options
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic input points around a polygon.")
+    parser.add_argument("polygon_file", help="csv file with the polygon vertices (id,x,y[,ring])")
+    parser.add_argument("output_file", help="file to write the points to")
+    parser.add_argument("--points", type=int, default=1426, help="number of points")
+    parser.add_argument("--distribution", default="grid", choices=DISTRIBUTIONS, help="distribution of the points")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator")
+    parser.add_argument("--format", default="csv", choices=POINT_FORMATS, help="format of the point file")
+    parser.add_argument("--expected", default=None, help="file to write the expected category of every point to")
+    parser.add_argument("--expected-format", default="csv", choices=OUTPUT_FORMATS,
+                        help="format of the expected categories")
+    parser.add_argument("--chunk-size", type=int, default=1000000, help="number of points generated at a time")
+    args = parser.parse_args()
+    main(args.polygon_file, args.output_file, args.points, args.distribution, args.seed, args.format, args.expected,
+         args.expected_format, args.chunk_size)
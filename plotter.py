@@ -0,0 +1,118 @@
+# Import modules for the Plotter class
+from collections import OrderedDict
+import matplotlib
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+import numpy as np
+
+# Colour and legend label of every point category
+POINT_STYLES = OrderedDict([("outside", ("red", "Outside")), ("boundary", ("blue", "Boundary")),
+                            ("inside", ("green", "Inside")), ("unclassified", ("black", "Unclassified"))])
+
+
+class Plotter:
+    """Definition of the Plotter class, used to plot the polygon, the MBR and the points.
+    An interactive Plotter opens a Tk window in show(); a non-interactive Plotter needs no GUI and can only write
+    the plot to a file with save().
+    """
+    def __init__(self, interactive=True):
+        self.interactive = interactive
+        if interactive is True:
+            # The Tk backend and pyplot are only needed for showing the plot in a window
+            matplotlib.use("TkAgg")
+            import matplotlib.pyplot as plt
+            self.figure = plt.figure()
+        else:
+            self.figure = Figure()
+        self.axes = self.figure.add_subplot()
+
+    def add_polygon(self, xs, ys):
+        self.axes.fill(xs, ys, "lightgray", label="Polygon", lw=2, zorder=0)
+
+    def add_polygon_rings(self, rings_xs, rings_ys):
+        """The add_polygon_rings() method plots a polygon of several rings (e.g. with holes) as one patch, filled
+        with the even-odd rule like the classification: every ring is oriented counter-clockwise if it lies inside
+        an even number of the other rings and clockwise otherwise, so that the non-zero filling of matplotlib gives
+        the same result.
+        """
+        rings = [np.column_stack((xs, ys)).astype(float) for xs, ys in zip(rings_xs, rings_ys) if len(xs) > 0]
+        vertices, codes = [], []
+        for i, ring in enumerate(rings):
+            depth = sum(Path(other).contains_point(ring[0]) for j, other in enumerate(rings) if j != i)
+            area = np.sum(ring[:, 0] * np.roll(ring[:, 1], -1) - np.roll(ring[:, 0], -1) * ring[:, 1])
+            if (area > 0) != (depth % 2 == 0):
+                ring = ring[::-1]
+            vertices.extend(ring.tolist() + [ring[0].tolist()])
+            codes.extend([Path.MOVETO] + [Path.LINETO] * (len(ring) - 1) + [Path.CLOSEPOLY])
+        self.axes.add_patch(PathPatch(Path(vertices, codes), facecolor="lightgray", edgecolor="lightgray",
+                                      label="Polygon", lw=2, zorder=0))
+        self.axes.autoscale_view()
+
+    # This method plots the MBR
+    def add_mbr(self, xs, ys):
+        self.axes.plot(xs, ys, "deepskyblue", label="MBR", linestyle="--", lw=1.4)
+
+    def add_point(self, x, y, kind=None):
+        if kind == "outside":
+            self.axes.plot(x, y, "ro", label="Outside")
+        elif kind == "boundary":
+            self.axes.plot(x, y, "bo", label="Boundary")
+        elif kind == "inside":
+            self.axes.plot(x, y, "go", label="Inside")
+        else:
+            self.axes.plot(x, y, "ko", label="Unclassified")
+
+    def add_points(self, xs, ys, kinds, max_points=None, rasterize_above=10000):
+        """The add_points() method plots many points at once, as one scatter collection per category (kinds holds
+        the category name of every point). If there are more than max_points points, a random sample of
+        max_points points is plotted. Above rasterize_above points the collections are rasterized, so that
+        vector output such as SVG stays small.
+        """
+        xs, ys, kinds = np.asarray(xs), np.asarray(ys), np.asarray(kinds)
+        if max_points is not None and len(xs) > max_points:
+            # The sample is seeded so that the same input always gives the same image
+            sample = np.sort(np.random.default_rng(0).choice(len(xs), max_points, replace=False))
+            xs, ys, kinds = xs[sample], ys[sample], kinds[sample]
+        # Marker area shrinks for large point sets, so that the points do not cover each other
+        size = 36 if len(xs) <= 1000 else max(1.0, 36000 / len(xs))
+        rasterized = len(xs) > rasterize_above
+        for kind, (colour, label) in POINT_STYLES.items():
+            if kind == "unclassified":
+                selected = ~np.isin(kinds, list(POINT_STYLES)[:3])
+            else:
+                selected = kinds == kind
+            if selected.any():
+                self.axes.scatter(xs[selected], ys[selected], s=size, c=colour, label=label, linewidths=0,
+                                  rasterized=rasterized)
+
+    # This method plots the ray from a point of interest
+    def add_ray(self, x, y, max_x_input):
+        """The add_ray() method plots a horizontal ray from the specified point."""
+        xs = [x, max_x_input + 1]
+        ys = [y, y]
+        self.axes.plot(xs, ys, label="Ray", linewidth=0.4,  color="black")
+
+    def add_rays(self, xs, ys, max_x_input, rasterize_above=10000):
+        """The add_rays() method plots a horizontal ray from every point, as a single line collection."""
+        ys = np.asarray(ys, dtype=float)
+        segments = np.stack((np.column_stack((xs, ys)), np.column_stack((np.full(len(ys), max_x_input + 1), ys))),
+                            axis=1)
+        self.axes.add_collection(LineCollection(segments, linewidths=0.4, colors="black", label="Ray",
+                                                rasterized=len(ys) > rasterize_above))
+
+    def _add_legend(self):
+        handles, labels = self.axes.get_legend_handles_labels()
+        by_label = OrderedDict(zip(labels, handles))
+        self.axes.legend(by_label.values(), by_label.keys())
+
+    def save(self, file_path, dpi=150):
+        """The save() method writes the plot to an image file; the format (e.g. PNG or SVG) follows the extension."""
+        self._add_legend()
+        self.figure.savefig(file_path, dpi=dpi)
+
+    def show(self):
+        self._add_legend()
+        import matplotlib.pyplot as plt
+        plt.show()
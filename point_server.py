@@ -0,0 +1,273 @@
+"""Long-running point classification service over HTTP.
+
+The polygons are read and prepared once at startup. Queries that arrive within a short window are grouped into
+one batched classify_points() call per polygon.
+
+Example: python point_server.py --polygon zone_a=polygon.csv --polygon zone_b=polygon_x.csv --port 8080
+
+- POST /classify with a JSON body {"polygon": "zone_a", "points": [[x1, y1], [x2, y2], ...]}
+  returns {"categories": ["inside", "outside", ...]};
+- GET /classify?polygon=zone_a&x=1.5&y=2 classifies a single point;
+- GET /stats returns the number of requests, points and batches, the throughput, the request latencies and, with
+  --cache-size, the hits and misses of the result cache.
+"""
+# Import argparse for the command line options
+import argparse
+# Import collections, json, threading and time for the request batching and statistics
+from collections import deque
+import json
+import threading
+import time
+# Import the HTTP server from the standard library
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+# Import numpy for the batches
+import numpy as np
+# Import the geometry core from main_from_file
+from main_from_file import ClassificationCache, read_polygon_from_file, classify_points, CATEGORY_NAMES
+# Import the cache of prepared polygons
+from polygon_cache import prepare_polygon
+
+
+class _Request:
+    """Definition of the _Request class, a query waiting in the batching queue for its categories."""
+    def __init__(self, polygon_name, xs, ys):
+        self.polygon_name = polygon_name
+        self.xs = xs
+        self.ys = ys
+        self.categories = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingClassifier:
+    """Definition of the BatchingClassifier class, which collects the queries arriving within window seconds (up
+    to max_batch_points points) and classifies them in one batch per polygon on a background thread.
+    BatchingClassifier object class has 1 required attribute: dictionary of prepared polygons by name.
+    """
+    def __init__(self, polygons, window=0.002, max_batch_points=1000000, latency_samples=10000, cache=None):
+        self.polygons = polygons
+        # Optional ClassificationCache; only the points missing from it are queued
+        self.cache = cache
+        self.window = window
+        self.max_batch_points = max_batch_points
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._has_requests = threading.Condition(self._lock)
+        # Statistics: counters, and the latencies in seconds of the most recent requests
+        self.started = time.perf_counter()
+        self.n_requests = 0
+        self.n_points = 0
+        self.n_batches = 0
+        self.latencies = deque(maxlen=latency_samples)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def classify(self, polygon_name, xs, ys):
+        """The classify() method queues a query, waits until its batch has been classified, and returns the
+        category codes of the points.
+        """
+        if polygon_name not in self.polygons:
+            raise KeyError(polygon_name)
+        start = time.perf_counter()
+        xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+        if self.cache is None:
+            categories = self._classify_queued(polygon_name, xs, ys)
+        else:
+            categories = self.cache.classify_points(
+                self.polygons[polygon_name], xs, ys,
+                lambda missing_xs, missing_ys: self._classify_queued(polygon_name, missing_xs, missing_ys))
+        with self._lock:
+            self.n_requests += 1
+            self.n_points += len(xs)
+            self.latencies.append(time.perf_counter() - start)
+        return categories
+
+    def _classify_queued(self, polygon_name, xs, ys):
+        """The _classify_queued() method queues points for the next batch and waits for their category codes."""
+        request = _Request(polygon_name, xs, ys)
+        with self._has_requests:
+            self._queue.append(request)
+            self._has_requests.notify()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.categories
+
+    def _run(self):
+        """The _run() method is the loop of the background thread: it waits for a first query, keeps collecting
+        queries for the batching window, and then classifies the batch.
+        """
+        while True:
+            with self._has_requests:
+                while not self._queue:
+                    self._has_requests.wait()
+            deadline = time.perf_counter() + self.window
+            while time.perf_counter() < deadline and self._queued_points() < self.max_batch_points:
+                time.sleep(self.window / 10)
+            with self._lock:
+                batch = list(self._queue)
+                self._queue.clear()
+            self._classify_batch(batch)
+
+    def _queued_points(self):
+        with self._lock:
+            return sum(len(request.xs) for request in self._queue)
+
+    def _classify_batch(self, batch):
+        """The _classify_batch() method classifies the queries of a batch with one classify_points() call per
+        polygon, and hands every query its own slice of the result.
+        """
+        by_polygon = {}
+        for request in batch:
+            by_polygon.setdefault(request.polygon_name, []).append(request)
+        for polygon_name, requests in by_polygon.items():
+            try:
+                categories = classify_points(self.polygons[polygon_name], np.concatenate([r.xs for r in requests]),
+                                             np.concatenate([r.ys for r in requests]))
+            except Exception as error:
+                # The waiting queries get the error instead of blocking forever
+                categories = None
+                for request in requests:
+                    request.error = error
+            start = 0
+            for request in requests:
+                if categories is not None:
+                    request.categories = categories[start:start + len(request.xs)]
+                start += len(request.xs)
+                request.done.set()
+        with self._lock:
+            self.n_batches += 1
+
+    def stats(self):
+        """The stats() method returns the request statistics as a dictionary: counts, throughput, and the mean,
+        median and 99th percentile latency in milliseconds of the most recent requests.
+        """
+        with self._lock:
+            latencies = np.array(self.latencies)
+            elapsed = time.perf_counter() - self.started
+            stats = {"requests": self.n_requests, "points": self.n_points, "batches": self.n_batches,
+                     "uptime_seconds": elapsed, "requests_per_second": self.n_requests / elapsed,
+                     "points_per_second": self.n_points / elapsed}
+        if len(latencies):
+            stats.update({"latency_mean_ms": 1000 * float(latencies.mean()),
+                          "latency_p50_ms": 1000 * float(np.percentile(latencies, 50)),
+                          "latency_p99_ms": 1000 * float(np.percentile(latencies, 99))})
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+class PointQueryHandler(BaseHTTPRequestHandler):
+    """Definition of the PointQueryHandler class, which answers the HTTP requests of the service."""
+    classifier = None
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _classify(self, polygon_name, xs, ys):
+        # Only an unknown polygon is answered with 404; any other error of the classification is not hidden
+        if polygon_name not in self.classifier.polygons:
+            self._send_json(404, {"error": "unknown polygon " + str(polygon_name)})
+            return
+        categories = self.classifier.classify(polygon_name, xs, ys)
+        self._send_json(200, {"categories": [CATEGORY_NAMES[code] for code in categories.tolist()]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self._send_json(200, self.classifier.stats())
+        elif url.path == "/classify":
+            query = parse_qs(url.query)
+            try:
+                x, y = float(query["x"][0]), float(query["y"][0])
+            except (KeyError, ValueError):
+                self._send_json(400, {"error": "x and y must be numbers"})
+                return
+            self._classify(query.get("polygon", [None])[0], [x], [y])
+        else:
+            self._send_json(404, {"error": "unknown path " + url.path})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/classify":
+            self._send_json(404, {"error": "unknown path " + self.path})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            points = np.array(body["points"], dtype=np.float64).reshape(-1, 2)
+            if not isinstance(body.get("polygon"), str):
+                raise TypeError("the polygon name must be a string")
+        except (KeyError, TypeError, ValueError):
+            self._send_json(400, {"error": "the body must be {\"polygon\": name, \"points\": [[x, y], ...]}"})
+            return
+        self._classify(body.get("polygon"), points[:, 0], points[:, 1])
+
+    def log_message(self, format, *args):
+        # Requests are counted in /stats instead of being logged one line each
+        pass
+
+
+class PointQueryServer(ThreadingHTTPServer):
+    """Definition of the PointQueryServer class, an HTTP server with one thread per connection and a listen queue
+    long enough for many concurrent clients.
+    """
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def load_polygons(polygon_files, slab_index=False, grid_resolution=None, polygon_cache=False):
+    """The load_polygons() function reads every polygon file once and prepares it, and returns a dictionary of
+    polygons by name. polygon_files is a dictionary of csv file paths by polygon name. With polygon_cache, the
+    prepared polygons are loaded from (and kept in) cache files next to the polygon files.
+    """
+    polygons = {}
+    for name, file_path in polygon_files.items():
+        if polygon_cache is True:
+            polygons[name] = prepare_polygon(file_path, slab_index, grid_resolution)
+            continue
+        polygon = read_polygon_from_file(file_path)
+        if slab_index is True:
+            polygon.build_slab_index()
+        if grid_resolution is not None:
+            polygon.build_grid(grid_resolution)
+        polygons[name] = polygon
+    return polygons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve point-in-polygon queries over HTTP.")
+    parser.add_argument("--polygon", action="append", required=True, metavar="NAME=FILE",
+                        help="polygon csv file to serve under NAME; can be given several times")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--window", type=float, default=0.002, help="batching window in seconds")
+    parser.add_argument("--slab-index", action="store_true", help="build a slab index over every polygon")
+    parser.add_argument("--grid", type=int, default=None, help="build a pre-classified grid of this resolution")
+    parser.add_argument("--polygon-cache", action="store_true",
+                        help="load the prepared polygons from cache files next to the polygon files")
+    parser.add_argument("--cache-size", type=int, default=0, help="cache the results of this many distinct points")
+    args = parser.parse_args(argv)
+
+    polygon_files = dict(item.split("=", 1) for item in args.polygon)
+    print("Read " + ", ".join(polygon_files.values()))
+    cache = ClassificationCache(args.cache_size) if args.cache_size > 0 else None
+    polygons = load_polygons(polygon_files, args.slab_index, args.grid, args.polygon_cache)
+    PointQueryHandler.classifier = BatchingClassifier(polygons, window=args.window, cache=cache)
+    server = PointQueryServer((args.host, args.port), PointQueryHandler)
+    print("Serving on http://" + args.host + ":" + str(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return None
+
+
+# If the whole file is executed:
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Cache of prepared polygons on disk, so that batch jobs do not re-read and re-prepare the same polygons every run.
+
+A prepared polygon (vertices and rings, MBR, edge arrays, convex fan, and the slab index and grid if they were built) is
+written next to its source file, e.g. polygon.csv.prepared, and memory-mapped when it is loaded. The cache is
+keyed by the SHA-256 hash of the content of the source file and by the boundary tolerances, so it is rebuilt
+whenever the source file changes.
+
+Layout of a file (all numbers little-endian):
+- header of 32 bytes: magic b"PIPPOLYG", format version (uint32), length of the directory in bytes (uint64),
+  padding;
+- directory: UTF-8 JSON with the cache key, the scalar attributes of the polygon, and the dtype, shape and offset
+  of every array;
+- arrays, each starting at a multiple of 8 bytes, with offsets counted from the first multiple of 8 bytes after
+  the directory.
+
+Example: python polygon_cache.py polygon.csv polygon_x.csv --slab-index --grid 64
+"""
+# Import argparse for the command line options
+import argparse
+# Import hashlib for the cache key, json for the directory, os for replacing cache files atomically
+import hashlib
+import json
+import os
+# Import struct for the file header
+import struct
+# Import numpy for the memory-mapped arrays
+import numpy as np
+# Import the geometry core from main_from_file
+from main_from_file import GridIndex, Point, Polygon, SlabIndex, read_polygon_from_file
+
+MAGIC = b"PIPPOLYG"
+VERSION = 4
+_HEADER = struct.Struct("<8sIQ")
+_HEADER_SIZE = 32
+# Suffix added to the source file path to get the path of its cache file
+CACHE_SUFFIX = ".prepared"
+# Edge arrays of a Polygon, which are all stored
+_EDGE_ARRAYS = ("edge_ax", "edge_ay", "edge_bx", "edge_by", "edge_inv_slope", "edge_y_min", "edge_y_max",
+                "edge_length", "edge_tol", "edge_cross_tol")
+
+
+def _align(offset):
+    return -(-offset // 8) * 8
+
+
+def file_hash(file_path):
+    """The file_hash() function returns the SHA-256 hash of the content of a file, read 1 MiB at a time."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path_for(polygon_file):
+    """The cache_path_for() function returns the path of the cache file of a polygon source file."""
+    return str(polygon_file) + CACHE_SUFFIX
+
+
+def save_prepared_polygon(polygon, cache_path, source_hash):
+    """The save_prepared_polygon() function writes a prepared polygon to a cache file. The file is written under a
+    temporary name and then renamed, so that concurrent runs never read a half-written cache.
+    """
+    arrays = {"vertex_ids": np.array([str(point.name).encode("utf-8") for point in polygon.points], dtype=np.bytes_),
+              "vertex_x": np.array(polygon.x_vertices(), dtype="<f8"),
+              "vertex_y": np.array(polygon.y_vertices(), dtype="<f8"),
+              "ring_sizes": np.array(polygon.ring_sizes, dtype="<i8")}
+    for name in _EDGE_ARRAYS:
+        arrays[name] = getattr(polygon, name)
+    if polygon.is_convex is True:
+        arrays["fan_x"], arrays["fan_y"] = np.array(polygon._hull_x), np.array(polygon._hull_y)
+    if polygon.slab_index is not None:
+        arrays["slab_ys"] = polygon.slab_index.slab_ys
+        arrays["slab_edge_ids"] = polygon.slab_index.edge_ids
+        arrays["slab_offsets"] = polygon.slab_index.offsets
+
+    directory = {"source_sha256": source_hash, "abs_tol": polygon.abs_tol, "rel_tol": polygon.rel_tol,
+                 "fingerprint": polygon.fingerprint, "min_x": polygon.min_x, "max_x": polygon.max_x,
+                 "min_y": polygon.min_y, "max_y": polygon.max_y, "signed_area": polygon.signed_area,
+                 "is_clockwise": polygon.is_clockwise, "is_convex": polygon.is_convex, "grid": None, "arrays": {}}
+    if polygon.grid is not None:
+        grid = polygon.grid
+        arrays["grid_cells"] = grid.cells
+        directory["grid"] = {"resolution": grid.resolution, "min_x": grid.min_x, "min_y": grid.min_y,
+                             "cell_w": grid.cell_w, "cell_h": grid.cell_h}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.kind in "fiu":
+            array = array.astype(array.dtype.newbyteorder("<"), copy=False)
+        arrays[name] = array
+        directory["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    encoded = json.dumps(directory).encode("utf-8")
+
+    temporary_path = cache_path + "." + str(os.getpid()) + ".tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(encoded)).ljust(_HEADER_SIZE, b"\0"))
+            f.write(encoded)
+            data_start = _align(f.tell())
+            for name, array in arrays.items():
+                f.write(b"\0" * (data_start + directory["arrays"][name]["offset"] - f.tell()))
+                f.write(array.tobytes())
+        os.replace(temporary_path, cache_path)
+    except BaseException:
+        # A cache file that could not be written completely is not left behind
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def load_prepared_polygon(cache_path, source_hash=None, abs_tol=1e-9, rel_tol=1e-9):
+    """The load_prepared_polygon() function reads a prepared polygon from a cache file, with its arrays
+    memory-mapped, and returns it. The function returns None if there is no cache file, if it is of another
+    format version, if it was prepared from a source file with another hash or with other tolerances, or if it is
+    truncated or corrupt.
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            magic, version, directory_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+            f.seek(_HEADER_SIZE)
+            directory = json.loads(f.read(directory_size).decode("utf-8"))
+        file_size = os.path.getsize(cache_path)
+        if (source_hash is not None and directory["source_sha256"] != source_hash) or \
+                directory["abs_tol"] != abs_tol or directory["rel_tol"] != rel_tol:
+            return None
+
+        data_start = _align(_HEADER_SIZE + directory_size)
+        arrays = {}
+        for name, entry in directory["arrays"].items():
+            dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+            size = dtype.itemsize * int(np.prod(shape))
+            if data_start + entry["offset"] + size > file_size:
+                return None
+            if size == 0:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                # Plain array views of the memory maps, as slicing a np.memmap is many times slower
+                arrays[name] = np.asarray(np.memmap(cache_path, dtype=dtype, mode="r",
+                                                    offset=data_start + entry["offset"], shape=shape))
+    except (OSError, struct.error, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+    # The polygon is restored attribute by attribute instead of being prepared again by Polygon.__init__()
+    polygon = Polygon.__new__(Polygon)
+    polygon.points = [Point(name.decode("utf-8"), x, y) for name, x, y in
+                      zip(arrays["vertex_ids"].tolist(), arrays["vertex_x"].tolist(), arrays["vertex_y"].tolist())]
+    polygon.abs_tol, polygon.rel_tol = abs_tol, rel_tol
+    polygon.ring_sizes = arrays["ring_sizes"].tolist()
+    polygon.fingerprint = directory["fingerprint"]
+    for name in _EDGE_ARRAYS:
+        setattr(polygon, name, arrays[name])
+    polygon._rows = None
+    polygon.min_x, polygon.max_x = directory["min_x"], directory["max_x"]
+    polygon.min_y, polygon.max_y = directory["min_y"], directory["max_y"]
+    polygon.max_edge_tol = float(polygon.edge_tol.max())
+    polygon.signed_area = directory["signed_area"]
+    polygon.is_clockwise = directory["is_clockwise"]
+    polygon.is_convex = False
+    polygon._hull_x = polygon._hull_y = polygon._hull_rows = polygon._hull_table = None
+    polygon._hull_centre = polygon._hull_angles = None
+    if directory["is_convex"] is True:
+        polygon._set_fan(arrays["fan_x"], arrays["fan_y"])
+
+    polygon.slab_index = None
+    if "slab_ys" in arrays:
+        slab_index = SlabIndex.__new__(SlabIndex)
+        slab_index.slab_ys = arrays["slab_ys"]
+        slab_index.edge_ids = arrays["slab_edge_ids"]
+        slab_index.offsets = arrays["slab_offsets"]
+        slab_index.max_edge_tol = polygon.max_edge_tol
+        slab_index._polygon = polygon
+        slab_index._rows = None
+        polygon.slab_index = slab_index
+
+    polygon.grid = None
+    if directory["grid"] is not None:
+        grid = GridIndex.__new__(GridIndex)
+        for name, value in directory["grid"].items():
+            setattr(grid, name, value)
+        grid.cells = arrays["grid_cells"]
+        grid.lookups = 0
+        grid.hits = 0
+        polygon.grid = grid
+    return polygon
+
+
+def prepare_polygon(polygon_file, slab_index=False, grid_resolution=None, abs_tol=1e-9, rel_tol=1e-9):
+    """The prepare_polygon() function returns the polygon of a source file, prepared with the requested slab index
+    and grid. The polygon is loaded from the cache file next to the source file if that cache is up to date;
+    otherwise it is prepared from the source file, and the cache file is (re)written. A source directory that is
+    not writable only means that the cache is not kept.
+    """
+    cache_path = cache_path_for(polygon_file)
+    source_hash = file_hash(polygon_file)
+    polygon = load_prepared_polygon(cache_path, source_hash, abs_tol, rel_tol)
+    changed = polygon is None
+    if polygon is None:
+        polygon = read_polygon_from_file(polygon_file, abs_tol, rel_tol)
+    # A cache may hold more than was asked for; what was not asked for is not used, nor dropped from the cache
+    cached_slab_index, cached_grid = polygon.slab_index, polygon.grid
+    if slab_index is False:
+        polygon.slab_index = None
+    if grid_resolution is None:
+        polygon.grid = None
+    if slab_index is True and polygon.slab_index is None:
+        polygon.build_slab_index()
+        changed = True
+    if grid_resolution is not None and (polygon.grid is None or polygon.grid.resolution != grid_resolution):
+        polygon.build_grid(grid_resolution)
+        changed = True
+    if changed is True:
+        requested = (polygon.slab_index, polygon.grid)
+        if polygon.slab_index is None:
+            polygon.slab_index = cached_slab_index
+        if polygon.grid is None:
+            polygon.grid = cached_grid
+        try:
+            save_prepared_polygon(polygon, cache_path, source_hash)
+        except OSError:
+            pass
+        polygon.slab_index, polygon.grid = requested
+    return polygon
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare polygons and write their cache files.")
+    parser.add_argument("polygon_files", nargs="+", help="csv files with the polygon vertices (id,x,y[,ring])")
+    parser.add_argument("--slab-index", action="store_true", help="include a slab index over the polygon edges")
+    parser.add_argument("--grid", type=int, default=None, help="include a pre-classified grid of this resolution")
+    args = parser.parse_args(argv)
+
+    for polygon_file in args.polygon_files:
+        prepare_polygon(polygon_file, args.slab_index, args.grid)
+        print("Prepared " + polygon_file + " in " + cache_path_for(polygon_file))
+    return None
+
+
+# If the whole file is executed:
+if __name__ == "__main__":
+    main()
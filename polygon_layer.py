@@ -0,0 +1,184 @@
+# Import numpy for the tree over the polygon MBRs and the batch queries
+import numpy as np
+# Import the geometry core from main_from_file
+from main_from_file import Point, Polygon, classify_points, OUTSIDE
+
+
+class STRTree:
+    """Definition of the STRTree class, an R-tree over rectangles packed with the Sort-Tile-Recursive algorithm.
+    The rectangles are given as arrays of min_x, min_y, max_x, max_y. Every node has at most node_capacity
+    children, and the children of node j on one level are the entries j * node_capacity to
+    (j + 1) * node_capacity - 1 on the level below, so the tree is stored as one array of boxes per level.
+    Reference: Leutenegger, Lopez and Edgington, STR: A Simple and Efficient Algorithm for R-Tree Packing, 1997.
+    """
+    def __init__(self, min_xs, min_ys, max_xs, max_ys, node_capacity=16):
+        self.node_capacity = node_capacity
+        boxes = np.column_stack((min_xs, min_ys, max_xs, max_ys)).astype(np.float64)
+        # Order of the rectangles on the leaf level; item_order[i] is the rectangle stored in leaf entry i
+        self.item_order = self._str_order(boxes)
+        # levels[0] holds the rectangles in leaf order, and the last level holds the single root box
+        self.levels = [boxes[self.item_order]]
+        while len(self.levels[-1]) > 1:
+            self.levels.append(self._parent_boxes(self.levels[-1]))
+
+    def _str_order(self, boxes):
+        """The _str_order() method sorts the rectangles by the x-coordinate of their centres, cuts them into vertical
+        slices of whole nodes, and sorts every slice by the y-coordinate of the centres.
+        """
+        n = len(boxes)
+        # An empty layer has no slices (and a slice size of 0)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        centres_x = (boxes[:, 0] + boxes[:, 2]) / 2
+        centres_y = (boxes[:, 1] + boxes[:, 3]) / 2
+        n_leaves = -(-n // self.node_capacity)
+        slice_size = int(np.ceil(np.sqrt(n_leaves))) * self.node_capacity
+        by_x = np.argsort(centres_x, kind="stable")
+        order = []
+        for start in range(0, n, slice_size):
+            vertical_slice = by_x[start:start + slice_size]
+            order.append(vertical_slice[np.argsort(centres_y[vertical_slice], kind="stable")])
+        return np.concatenate(order)
+
+    def _parent_boxes(self, boxes):
+        """The _parent_boxes() method returns the bounding box of every group of node_capacity consecutive boxes."""
+        starts = np.arange(0, len(boxes), self.node_capacity)
+        return np.column_stack((np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+                                np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts)))
+
+    def query(self, x, y):
+        """The query() method returns the ids of the rectangles containing the point (x, y)."""
+        nodes = [0] if len(self.levels[0]) else []
+        for level in reversed(range(len(self.levels))):
+            boxes = self.levels[level]
+            found = []
+            for node in nodes:
+                min_x, min_y, max_x, max_y = boxes[node]
+                if min_x <= x <= max_x and min_y <= y <= max_y:
+                    found.append(node)
+            if level == 0:
+                return [int(self.item_order[entry]) for entry in found]
+            # The children of the nodes found on this level are checked on the level below
+            nodes = [child for node in found
+                     for child in range(node * self.node_capacity,
+                                        min((node + 1) * self.node_capacity, len(self.levels[level - 1])))]
+        return []
+
+    def query_points(self, xs, ys):
+        """The query_points() method is the batch version of query(): it walks down the tree with all points at once,
+        and returns a list of (rectangle id, indices of the points inside that rectangle) pairs.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        # Pairs of (node on the current level, indices of the points inside its box)
+        pending = [(0, np.arange(len(xs)))] if len(self.levels[0]) else []
+        results = []
+        for level in reversed(range(len(self.levels))):
+            boxes = self.levels[level]
+            found = []
+            for node, index in pending:
+                min_x, min_y, max_x, max_y = boxes[node]
+                inside = (min_x <= xs[index]) & (xs[index] <= max_x) & (min_y <= ys[index]) & (ys[index] <= max_y)
+                if inside.any():
+                    found.append((node, index[inside]))
+            if level == 0:
+                results = [(int(self.item_order[entry]), index) for entry, index in found]
+                break
+            pending = [(child, index) for node, index in found
+                       for child in range(node * self.node_capacity,
+                                          min((node + 1) * self.node_capacity, len(self.levels[level - 1])))]
+        return results
+
+
+class PolygonLayer:
+    """Definition of the PolygonLayer class, a collection of polygons (zones) with an STRTree over their MBRs.
+    PolygonLayer object class has 2 required attributes: list of zone ids, and list of Polygon objects.
+    """
+    def __init__(self, zone_ids, polygons):
+        self.zone_ids = list(zone_ids)
+        self.polygons = list(polygons)
+        # The MBRs are widened by the boundary tolerance, as points just outside them can be on the boundary
+        self.tree = STRTree([polygon.min_x - polygon.max_edge_tol for polygon in self.polygons],
+                            [polygon.min_y - polygon.max_edge_tol for polygon in self.polygons],
+                            [polygon.max_x + polygon.max_edge_tol for polygon in self.polygons],
+                            [polygon.max_y + polygon.max_edge_tol for polygon in self.polygons])
+
+    def zones_containing(self, point):
+        """The zones_containing() method takes a point and returns the ids of the zones that contain the point,
+        including zones on whose boundary the point lies, in the order of the layer as assign_points() does. Only
+        the zones whose MBR contains the point are tested.
+        """
+        zones = []
+        for i in sorted(self.tree.query(point.x, point.y)):
+            polygon = self.polygons[i]
+            if polygon.boundary(point) is True or polygon.contains(point) is True:
+                zones.append(self.zone_ids[i])
+        return zones
+
+    def assign_points(self, xs, ys):
+        """The assign_points() method takes the x- and y-coordinates of many points as arrays, and returns a list
+        with the ids of the zones containing every point (an empty list if no zone contains it). Every zone is
+        batch classified against the points inside its MBR only.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        assignment = [[] for _ in range(len(xs))]
+        for i, index in sorted(self.tree.query_points(xs, ys), key=lambda pair: pair[0]):
+            categories = classify_points(self.polygons[i], xs[index], ys[index])
+            for point_index in index[categories != OUTSIDE].tolist():
+                assignment[point_index].append(self.zone_ids[i])
+        return assignment
+
+
+def read_polygon_layer_from_file(file_path):
+    """The read_polygon_layer_from_file() function takes a csv file with the columns zone,id,x,y, where the vertices
+    of every zone are listed in order, and returns a PolygonLayer with one polygon per zone. With a fifth column
+    ring (zone,id,x,y,ring), the vertices of a zone are grouped into rings, e.g. an outer ring and its holes.
+    """
+    rings_by_zone = {}
+    with open(file_path, "r") as f:
+        columns = [column.strip() for column in f.readline().split(",")]
+        ring_column = columns.index("ring") if "ring" in columns else None
+        for line in f:
+            if not line.strip():
+                continue
+            items = line.split(",")
+            zone = str(items[0])
+            ring = items[ring_column].strip() if ring_column is not None else None
+            rings_by_zone.setdefault(zone, {}).setdefault(ring, []).append(
+                Point(str(items[1]), float(items[2]), float(items[3])))
+    return PolygonLayer(rings_by_zone.keys(), [Polygon.from_rings(rings.values()) for rings in rings_by_zone.values()])
+
+
+def main(polygon_layer_file, input_points_file, output_points_file="zones_output.csv"):
+    print("Read " + str(polygon_layer_file))
+    layer = read_polygon_layer_from_file(polygon_layer_file)
+
+    print("Read " + str(input_points_file))
+    ids, xs, ys = [], [], []
+    with open(input_points_file, "r") as f:
+        for line in (f.readlines()[1:]):
+            items = line.split(",")
+            ids.append(str(items[0]))
+            xs.append(float(items[1]))
+            ys.append(float(items[2]))
+
+    print("Assign points to zones")
+    assignment = layer.assign_points(xs, ys)
+
+    # For each input point, write point name/id with the ids of the zones containing it, separated by ";"
+    print("Write " + str(output_points_file))
+    output_file = open(output_points_file, "w+")
+    output_file.write("id,zones")
+    for name, zones in zip(ids, assignment):
+        output_file.write("\n")
+        output_file.write(name + "," + ";".join(zones))
+    output_file.close()
+    return None
+
+
+# If the whole file is executed:
+if __name__ == "__main__":
+    layer_file = "zones.csv"
+    input_file = "input.csv"
+    main(layer_file, input_file)
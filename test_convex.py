@@ -0,0 +1,81 @@
+"""Differential tests of the wedge test of convex polygons against the ray casting test of the general path.
+
+Run with: python -m pytest test_convex.py
+"""
+# Import numpy for the random polygons and points
+import numpy as np
+# Import the geometry core from main_from_file
+from main_from_file import Point, Polygon, classify_points, BOUNDARY
+
+
+def densify(xs, ys, n):
+    """The densify() function returns the vertices of a polygon with n - 1 collinear vertices added on every edge."""
+    t = np.arange(n) / n
+    next_xs, next_ys = np.roll(xs, -1), np.roll(ys, -1)
+    return (xs[:, None] + t * (next_xs - xs)[:, None]).ravel(), (ys[:, None] + t * (next_ys - ys)[:, None]).ravel()
+
+
+def make_polygons(rng):
+    """The make_polygons() function yields the vertices of convex polygons with runs of collinear vertices: densified
+    rectangles, triangles and heptagons, in both orientations, starting at a corner or inside a run. The vertices
+    have integer coordinates and are densified by powers of two, so that the added vertices are exactly collinear.
+    """
+    rectangle = (np.array([0.0, 4.0, 4.0, 0.0]), np.array([0.0, 0.0, 4.0, 4.0]))
+    triangle = (np.array([-2.0, 3.0, 1.0]), np.array([-1.0, -1.0, 5.0]))
+    heptagon = (np.array([0.0, 4.0, 8.0, 10.0, 8.0, 2.0, -1.0]), np.array([0.0, -2.0, 0.0, 4.0, 8.0, 8.0, 4.0]))
+    for xs, ys in (rectangle, triangle, heptagon):
+        for n in (1, 2, 4, 16):
+            dense_xs, dense_ys = densify(xs, ys, n)
+            for shift in (0, 1, int(rng.integers(0, len(dense_xs)))):
+                rolled_xs, rolled_ys = np.roll(dense_xs, shift), np.roll(dense_ys, shift)
+                yield rolled_xs, rolled_ys
+                yield rolled_xs[::-1], rolled_ys[::-1]
+
+
+def make_points(xs, ys, rng):
+    """The make_points() function returns points around a polygon: random points over its MBR, its vertices, points
+    on its edges, and points a little off its edges.
+    """
+    t = rng.uniform(0, 1, 200)
+    edges = rng.integers(0, len(xs), 200)
+    next_edges = (edges + 1) % len(xs)
+    on_x = xs[edges] + t * (xs[next_edges] - xs[edges])
+    on_y = ys[edges] + t * (ys[next_edges] - ys[edges])
+    off = rng.normal(0, 1e-3, (2, 200))
+    point_xs = np.concatenate((rng.uniform(xs.min() - 1, xs.max() + 1, 500), xs, (xs + np.roll(xs, -1)) / 2, on_x,
+                               on_x + off[0]))
+    point_ys = np.concatenate((rng.uniform(ys.min() - 1, ys.max() + 1, 500), ys, (ys + np.roll(ys, -1)) / 2, on_y,
+                               on_y + off[1]))
+    return point_xs, point_ys
+
+
+def general_copy(xs, ys):
+    """The general_copy() function returns the polygon of the given vertices, classified without the wedge test."""
+    polygon = Polygon([Point(i, x, y) for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))])
+    polygon.is_convex = False
+    return polygon
+
+
+def test_wedge_test_matches_ray_casting():
+    rng = np.random.default_rng(0)
+    for xs, ys in make_polygons(rng):
+        convex = Polygon([Point(i, x, y) for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))])
+        assert convex.is_convex is True
+        general = general_copy(xs, ys)
+        point_xs, point_ys = make_points(xs, ys, rng)
+        expected = classify_points(general, point_xs, point_ys)
+        assert np.array_equal(classify_points(convex, point_xs, point_ys), expected)
+        per_point = [convex.classify(Point(i, x, y)) for i, (x, y) in enumerate(zip(point_xs.tolist(),
+                                                                                      point_ys.tolist()))]
+        assert np.array_equal(np.array(per_point), expected)
+
+
+def test_points_between_collinear_vertices_from_vertex_0():
+    xs = np.array([0.0, 1, 2, 3, 4, 4, 0])
+    ys = np.array([0.0, 0, 0, 0, 0, 4, 4])
+    polygon = Polygon([Point(i, x, y) for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))])
+    assert polygon.is_convex is True
+    point_xs, point_ys = np.array([1.5, 2.0, 2.5, 0.0, 0.0]), np.array([0.0, 0.0, 0.0, 1.5, 2.0])
+    assert np.all(classify_points(polygon, point_xs, point_ys) == BOUNDARY)
+    for x, y in zip(point_xs.tolist(), point_ys.tolist()):
+        assert polygon.classify(Point("p", x, y)) == BOUNDARY
@@ -0,0 +1,70 @@
+"""Tests of the slab index against the plain classification of all edges.
+
+Run with: python -m pytest test_slab_index.py
+"""
+# Import os for the paths of the polygon files next to this file
+import os
+# Import numpy for the points
+import numpy as np
+# Import the geometry core from main_from_file
+from main_from_file import Point, Polygon, SlabIndex, classify_points, read_polygon_from_file, BOUNDARY
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def classify_with_and_without_slab_index(file_name, xs, ys):
+    """The classify_with_and_without_slab_index() function returns the categories of the points from the plain
+    batch path, and from the batch and per-point paths of the same polygon with a slab index.
+    """
+    plain = read_polygon_from_file(os.path.join(HERE, file_name))
+    indexed = read_polygon_from_file(os.path.join(HERE, file_name)).build_slab_index()
+    per_point = np.array([indexed.classify(Point(i, x, y)) for i, (x, y) in enumerate(zip(xs.tolist(),
+                                                                                          ys.tolist()))])
+    return classify_points(plain, xs, ys), classify_points(indexed, xs, ys), per_point
+
+
+def test_points_within_tolerance_below_and_above_the_polygon():
+    # Half the boundary tolerance below and above the bottom and top edges of polygon.csv, which pass through
+    # (2, 0) and (2, 7), and the four corners of polygon_holes.csv, at (0, 0), (7, 0), (0, 7) and (7, 7)
+    cases = (("polygon.csv", np.array([2.0, 2.0]), np.array([-5e-10, 7 + 5e-10])),
+             ("polygon_holes.csv", np.array([0.0, 7.0, 0.0, 7.0]), np.array([-5e-10, -5e-10, 7 + 5e-10, 7 + 5e-10])))
+    for file_name, xs, ys in cases:
+        plain, indexed, per_point = classify_with_and_without_slab_index(file_name, xs, ys)
+        assert np.all(plain == BOUNDARY)
+        assert np.all(indexed == BOUNDARY)
+        assert np.all(per_point == BOUNDARY)
+
+
+def test_slab_index_matches_plain_classification():
+    rng = np.random.default_rng(0)
+    for file_name in ("polygon.csv", "polygon_holes.csv"):
+        polygon = read_polygon_from_file(os.path.join(HERE, file_name))
+        # Random points over the MBR, and points a little off the vertices and edge midpoints
+        xs = np.concatenate((rng.uniform(polygon.min_x - 1, polygon.max_x + 1, 2000), polygon.edge_ax,
+                             (polygon.edge_ax + polygon.edge_bx) / 2))
+        ys = np.concatenate((rng.uniform(polygon.min_y - 1, polygon.max_y + 1, 2000), polygon.edge_ay,
+                             (polygon.edge_ay + polygon.edge_by) / 2))
+        offsets = rng.choice([-2e-9, -5e-10, 0.0, 5e-10, 2e-9], (2, len(xs)))
+        plain, indexed, per_point = classify_with_and_without_slab_index(file_name, xs + offsets[0], ys + offsets[1])
+        assert np.array_equal(indexed, plain)
+        assert np.array_equal(per_point, plain)
+
+
+def test_slab_index_of_a_star_stays_bounded():
+    # A star with many spikes: most edges span the heights of many vertices, so one slab per vertex height would
+    # keep about a thousand entries per edge
+    theta = np.linspace(0, 2 * np.pi, 4000, endpoint=False)
+    radius = np.where(np.arange(len(theta)) % 2 == 0, 1.0, 0.5)
+    xs, ys = radius * np.cos(theta), radius * np.sin(theta)
+    polygon = Polygon([Point(i, x, y) for i, (x, y) in enumerate(zip(xs.tolist(), ys.tolist()))])
+    plain = Polygon(polygon.points)
+    polygon.build_slab_index()
+    assert len(polygon.slab_index.edge_ids) <= SlabIndex.MAX_ENTRIES_PER_EDGE * len(polygon.edge_ax)
+    rng = np.random.default_rng(0)
+    point_xs = np.concatenate((rng.uniform(-1.1, 1.1, 2000), xs))
+    point_ys = np.concatenate((rng.uniform(-1.1, 1.1, 2000), ys))
+    categories = classify_points(polygon, point_xs, point_ys)
+    assert np.array_equal(categories, classify_points(plain, point_xs, point_ys))
+    per_point = [polygon.classify(Point(i, x, y)) for i, (x, y) in enumerate(zip(point_xs[::10].tolist(),
+                                                                                 point_ys[::10].tolist()))]
+    assert np.array_equal(np.array(per_point), categories[::10])